@@ -0,0 +1,355 @@
+#! /usr/bin/env python
+'''
+    Benchmarks csv_to_static_groups against a simulated Turbonomic server.
+
+    Each phase runs in a fresh process and reports wall time, api calls per
+    endpoint and peak RSS, so results can be compared across versions.
+
+    Phases:
+        parse
+            - CSVGroupParser.parse on the generated csv
+        sync_cold
+            - main() against a server without any of the groups
+        sync_warm
+            - main() again after a cold sync, nothing to change
+        static_group
+            - StaticGroup.add_or_update(lookup_names=True) for a sample of groups
+        validate
+            - csv_to_static_groups.py --validate_only in a new interpreter,
+              including interpreter startup and imports
+
+    Usage:
+        $ ./benchmark_sync.py --rows 1000 100000 --latency 5 --json results.json
+        $ ./benchmark_sync.py --rows 1000 --server_groups 200000 --phases sync_cold
+        $ ./benchmark_sync.py --rows 1000 --estate 400000 --lookup_method regex
+        $ ./benchmark_sync.py --rows 1000000 --phases parse --parse_workers 1
+        $ ./benchmark_sync.py --rows 1000000 --phases parse --parse_workers 4
+        $ ./benchmark_sync.py --rows 1000 --phases validate
+'''
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "csv_to_static_groups"))
+import csv_to_static_groups
+
+__version__ = "1.0.0"
+
+PHASES = ["parse", "sync_cold", "sync_warm", "static_group", "validate"]
+ROW_COUNTS = [1000, 100000, 1000000]
+ENTITY_TYPES = ["VirtualMachine", "PhysicalMachine"]
+DEPARTMENTS = 10
+ROWS_PER_OWNER = 100
+MISSING_RATIO = 0.01
+STATIC_GROUP_SAMPLE = 20
+PAGE_SIZE = 500
+# Name filter types of search criteria, as vmtconnect and Turbonomic use them
+FILTER_TYPES = {"Group": "groupsByName", "VirtualMachine": "vmsByName",
+                "PhysicalMachine": "pmsByName", "Storage": "storageByName"}
+
+class FakeTurbonomic(object):
+    """In-process stand-in for a vmtconnect connection.
+
+    Implements the vmtconnect methods used by csv_to_static_groups, sleeping
+    latency seconds per call and counting calls per endpoint. Like a
+    paginating server, listings return only their first PAGE_SIZE results
+    unless called with fetch_all=True or pager=True. Search criteria with a
+    filter type other than FILTER_TYPES are rejected.
+
+    Args:
+        entities (list): Entity dictionaries known to the server.
+        latency (float, optional): Seconds to wait on every call.
+        server_groups (int, optional): Number of other groups on the server,
+            which the csv does not list.
+    """
+    def __init__(self, entities, latency=0, server_groups=0):
+        self.host = "benchmark"
+        self.latency = 0
+        self.calls = Counter()
+        self._entities = entities
+        self._by_uuid = {e["uuid"]: e for e in entities}
+        self._groups = {}
+        self._group_names = {}
+        self._lock = threading.Lock()
+        for i in range(server_groups):
+            self.add_static_group("discovered-{}".format(i), ENTITY_TYPES[0])
+        self.calls.clear()
+        self.latency = latency
+
+    def _call(self, endpoint):
+        with self._lock:
+            self.calls[endpoint] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def _page(results, kwargs):
+        if kwargs.get("fetch_all") or kwargs.get("pager"):
+            return results
+        return results[:PAGE_SIZE]
+
+    def _group_dto(self, uuid):
+        group = self._groups[uuid]
+        return {"uuid": uuid, "displayName": group["displayName"],
+                "groupType": group["groupType"], "isStatic": True,
+                "membersCount": len(group["members"])}
+
+    def search(self, types=None, dto=None, **kwargs):
+        self._call("search")
+        if dto is not None:
+            dto = json.loads(dto)
+            criteria = dto["criteriaList"][0]
+            if criteria["filterType"] != FILTER_TYPES.get(dto["className"]):
+                raise ValueError("Invalid filterType {} for {}".format(
+                    criteria["filterType"], dto["className"]))
+            pattern = re.compile(criteria["expVal"],
+                                 0 if criteria["caseSensitive"] else re.IGNORECASE)
+            if dto["className"] == "Group":
+                return self._page([self._group_dto(uuid) for uuid in list(self._groups)
+                                   if pattern.search(self._groups[uuid]["displayName"])],
+                                  kwargs)
+            return self._page([dict(e) for e in self._entities
+                               if e["className"] == dto["className"]
+                               and pattern.search(e["displayName"])], kwargs)
+        return self._page([dict(e) for e in self._entities
+                           if not types or e["className"] in types], kwargs)
+
+    def search_by_name(self, name, type=None, case_sensitive=False, **kwargs):
+        self._call("search_by_name")
+        if not case_sensitive:
+            name = name.lower()
+        matches = []
+        for e in self._entities:
+            e_name = e["displayName"] if case_sensitive else e["displayName"].lower()
+            if e_name == name and (type is None or e["className"] == type):
+                matches.append(dict(e))
+        return self._page(matches, kwargs)
+
+    def get_supplychains(self, uuids, types=None, **kwargs):
+        self._call("get_supplychains")
+        counts = Counter(e["className"] for e in self._entities
+                         if not types or e["className"] in types)
+        return [{"seMap": {e_type: {"entitiesCount": count}
+                           for e_type, count in counts.items()}}]
+
+    def get_groups(self, **kwargs):
+        self._call("get_groups")
+        return self._page([self._group_dto(uuid) for uuid in list(self._groups)],
+                          kwargs)
+
+    def get_group_by_name(self, name, **kwargs):
+        self._call("get_group_by_name")
+        matches = [self._group_dto(uuid)
+                   for uuid in self._group_names.get(name, [])]
+        return matches or None
+
+    def get_group_members(self, uuid, **kwargs):
+        self._call("get_group_members")
+        return self._page([dict(self._by_uuid[m])
+                           for m in self._groups[uuid]["members"]], kwargs)
+
+    def add_static_group(self, name, type, members=None):
+        self._call("add_static_group")
+        with self._lock:
+            uuid = "group-{}".format(len(self._groups))
+            self._groups[uuid] = {"displayName": name, "groupType": type,
+                                  "members": list(members or [])}
+            self._group_names.setdefault(name, []).append(uuid)
+        return [self._group_dto(uuid)]
+
+    def update_static_group_members(self, uuid, members, name=None, type=None):
+        self._call("update_static_group_members")
+        self._groups[uuid]["members"] = list(members)
+        return [self._group_dto(uuid)]
+
+    def del_group(self, uuid):
+        self._call("del_group")
+        with self._lock:
+            self._group_names[self._groups[uuid]["displayName"]].remove(uuid)
+            del self._groups[uuid]
+        return True
+
+def generate_csv(path, rows, estate=0, seed=0):
+    """Writes a csv with two group columns and returns its entities.
+
+    Returns:
+        List of entity dictionaries for every named entity, except a
+        MISSING_RATIO share that is left off the server, followed by estate
+        entities the csv does not list.
+    """
+    rand = random.Random(seed)
+    owners = max(rows // ROWS_PER_OWNER, 1)
+    entities = []
+    with open(path, "w", newline="") as csv_out:
+        writer = csv.writer(csv_out)
+        writer.writerow([csv_to_static_groups.ENTITY_TYPE_HEADER,
+                         csv_to_static_groups.ENTITY_NAME_HEADER,
+                         "Department", "Owner"])
+        for i in range(rows):
+            e_type = ENTITY_TYPES[i % len(ENTITY_TYPES)]
+            name = "entity-{:07d}".format(i)
+            # Group names are unique per entity type
+            writer.writerow([e_type, name,
+                             "{}-dept-{}".format(e_type, rand.randrange(DEPARTMENTS)),
+                             "owner-{}".format(rand.randrange(owners))])
+            if rand.random() >= MISSING_RATIO:
+                entities.append({"uuid": "uuid-{:07d}".format(i),
+                                 "displayName": name, "className": e_type,
+                                 "state": "ACTIVE"})
+    for i in range(estate):
+        entities.append({"uuid": "estate-{:07d}".format(i),
+                         "displayName": "estate-{:07d}".format(i),
+                         "className": ENTITY_TYPES[i % len(ENTITY_TYPES)],
+                         "state": "ACTIVE"})
+    return entities
+
+def _max_rss_mb():
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        # Reported in bytes on macOS, kilobytes elsewhere
+        max_rss /= 1024
+    return max_rss / 1024.0
+
+def _run_phase(phase, csv_file, entities, latency, server_groups, main_kwargs,
+               results):
+    """Runs a single phase in the current process and sends its results"""
+    conn = FakeTurbonomic(entities, latency=latency, server_groups=server_groups)
+    if phase == "sync_warm":
+        csv_to_static_groups.main(conn, csv_file, **main_kwargs)
+    elif phase == "static_group":
+        groups = csv_to_static_groups.CSVGroupParser(
+            csv_to_static_groups.ENTITY_TYPE_HEADER,
+            csv_to_static_groups.ENTITY_NAME_HEADER).parse(csv_file)[:STATIC_GROUP_SAMPLE]
+        # Missing names raise on lookup, only sample names the server knows
+        known = set(e["displayName"] for e in entities)
+        for group in groups:
+            group["members"] = [m for m in group["members"] if m in known]
+    conn.calls.clear()
+    rss_before = _max_rss_mb()
+
+    start = time.time()
+    if phase == "parse":
+        csv_to_static_groups.CSVGroupParser(
+            csv_to_static_groups.ENTITY_TYPE_HEADER,
+            csv_to_static_groups.ENTITY_NAME_HEADER).parse(
+                csv_file, workers=main_kwargs.get("parse_workers", 1))
+    elif phase in ["sync_cold", "sync_warm"]:
+        csv_to_static_groups.main(conn, csv_file, **main_kwargs)
+    elif phase == "validate":
+        subprocess.run([sys.executable, csv_to_static_groups.__file__, csv_file,
+                        "--validate_only"], check=True, stdout=subprocess.DEVNULL)
+    elif phase == "static_group":
+        for group in groups:
+            csv_to_static_groups.StaticGroup(conn, group["name"],
+                                             group["entity_type"],
+                                             group["members"]).add_or_update(lookup_names=True)
+    wall_time = time.time() - start
+
+    results.send({"wall_time": round(wall_time, 3),
+                  "api_calls": dict(conn.calls),
+                  "rss_before_mb": round(rss_before, 1),
+                  "peak_rss_mb": round(_max_rss_mb(), 1)})
+
+def run_benchmark(rows, phases=PHASES, latency=0, server_groups=0, estate=0,
+                  main_kwargs={}):
+    """Generates a csv with rows rows and runs each phase in a new process.
+
+    Returns:
+        Dictionary of phase results::
+
+            {"phase": {"wall_time": float, "api_calls": {"endpoint": int},
+                       "rss_before_mb": float, "peak_rss_mb": float}}
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_file = os.path.join(tmp_dir, "benchmark.csv")
+        entities = generate_csv(csv_file, rows, estate=estate)
+        for phase in phases:
+            receiver, sender = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_run_phase,
+                                              args=(phase, csv_file, entities,
+                                                    latency, server_groups,
+                                                    main_kwargs, sender))
+            process.start()
+            results[phase] = receiver.recv()
+            process.join()
+    return results
+
+def _print_results(rows, results):
+    print("\n{} rows".format(rows))
+    print("{:<14}{:>10}{:>12}{:>12}  {}".format("phase", "wall (s)",
+                                                "rss before", "peak rss",
+                                                "api calls"))
+    for phase, result in results.items():
+        calls = ", ".join("{}={}".format(k, v)
+                          for k, v in sorted(result["api_calls"].items()))
+        print("{:<14}{:>10}{:>12}{:>12}  {}".format(phase, result["wall_time"],
+                                                    result["rss_before_mb"],
+                                                    result["peak_rss_mb"],
+                                                    calls))
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark csv_to_static_groups against a simulated Turbonomic server")
+    arg_parser.add_argument("--rows", nargs='+', type=int, required=False,
+                            default=ROW_COUNTS[:2],
+                            help="CSV sizes to benchmark. Default={}".format(ROW_COUNTS[:2]))
+    arg_parser.add_argument("--phases", nargs='+', choices=PHASES,
+                            required=False, default=PHASES,
+                            help="Phases to run. Default=all")
+    arg_parser.add_argument("--latency", action="store", type=float,
+                            required=False, default=0,
+                            help="Simulated milliseconds per api call. Default=0")
+    arg_parser.add_argument("--server_groups", action="store", type=int,
+                            required=False, default=0,
+                            help="Groups on the server that the csv does not list. Default=0")
+    arg_parser.add_argument("--estate", action="store", type=int,
+                            required=False, default=0,
+                            help="Entities on the server that the csv does not list. Default=0")
+    arg_parser.add_argument("--lookup_method", action="store", required=False,
+                            choices=csv_to_static_groups.LOOKUP_METHODS,
+                            default=csv_to_static_groups.LOOKUP_AUTO,
+                            help="main() lookup method. Default={}".format(
+                                csv_to_static_groups.LOOKUP_AUTO))
+    arg_parser.add_argument("--workers", action="store", type=int,
+                            required=False, default=1,
+                            help="main() workers. Default=1")
+    arg_parser.add_argument("--parse_workers", action="store", type=int,
+                            required=False, default=1,
+                            help="Processes parsing the csv. Default=1")
+    arg_parser.add_argument("--json", action="store", required=False,
+                            help="Path to write results as JSON")
+    args_dict = vars(arg_parser.parse_args())
+
+    all_results = {"csv_to_static_groups": csv_to_static_groups.__version__,
+                   "latency_ms": args_dict["latency"],
+                   "cpu_count": os.cpu_count(), "runs": {}}
+    if args_dict["parse_workers"] > (os.cpu_count() or 1):
+        # iter_groups caps parse workers, parse scaling needs as many CPUs
+        print("Only {} CPUs, parsing with {} workers instead of {}".format(
+            os.cpu_count(), os.cpu_count() or 1, args_dict["parse_workers"]))
+    for rows in args_dict["rows"]:
+        results = run_benchmark(rows, phases=args_dict["phases"],
+                                latency=args_dict["latency"] / 1000.0,
+                                server_groups=args_dict["server_groups"],
+                                estate=args_dict["estate"],
+                                main_kwargs={"workers": args_dict["workers"],
+                                             "lookup_method": args_dict["lookup_method"],
+                                             "parse_workers": args_dict["parse_workers"]})
+        all_results["runs"][str(rows)] = results
+        _print_results(rows, results)
+
+    if args_dict["json"]:
+        with open(args_dict["json"], "w") as json_out:
+            json.dump(all_results, json_out, indent=2)
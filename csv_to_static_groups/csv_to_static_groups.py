@@ -1,16 +1,21 @@
 #! /usr/bin/env python
-import vmtconnect as vconn
 import csv
 import argparse
 from getpass import getpass
-import requests
-from requests.packages.urllib3.exceptions import InsecureRequestWarning
 import logging
-import traceback
 from logging.handlers import RotatingFileHandler
 import sys
 import json
-from functools import wraps
+from functools import wraps, partial
+import re
+import time
+from collections import namedtuple, Counter, deque
+from contextlib import contextmanager
+import threading
+import codecs
+import importlib
+import io
+import os
 
 __version__ = "1.1.6"
 
@@ -32,10 +37,73 @@ TRK_ADD = "Added"
 TRK_UPDATE = "Updated"
 TRK_SKIP = "Skipped"
 
+# _RunMetrics Variables
+RUN_METRICS = "Metrics"
+PHASE_PARSE = "parse"
+PHASE_GROUP_INDEX = "group index"
+PHASE_RESOLVE = "name resolution"
+PHASE_DIFF = "diff"
+PHASE_COMMIT = "commit"
+PHASE_OTHER = "other"
+LATENCY_PERCENTILES = [50, 90, 99]
+
+# sync_targets Variables
+RUN_TARGETS = "Targets"
+
+# GroupUpdateUtility Variables
+GROUP_FILTER_LENGTH = 2000
+GROUP_FILTER_REQUESTS = 10
+GROUP_NAME_FILTER = "groupsByName"
+
 # GroupParser Variables
 ENTITY_TYPE_HEADER = "Entity Type"
 ENTITY_NAME_HEADER = "Entity Name"
 GROUP_DELIMITER = "_"
+PARSE_CHUNK_SIZE = 64 * 1024 * 1024
+STDIN_CSV = "-"
+# Modules whose open function reads each compressed csv extension
+CSV_OPENERS = {".gz": "gzip", ".bz2": "bz2", ".xz": "lzma"}
+
+# export_groups Variables
+GROUP_NAME_HEADER = "Group Name"
+GROUP_TYPE_HEADER = "Group Type"
+
+# StaticGroup Variables
+NAME_SEARCH_LIMIT = 20
+
+# EntityNameResolver Variables
+LOOKUP_BULK = "bulk"
+LOOKUP_NAME = "name"
+LOOKUP_REGEX = "regex"
+LOOKUP_AUTO = "auto"
+LOOKUP_METHODS = [LOOKUP_BULK, LOOKUP_NAME, LOOKUP_REGEX, LOOKUP_AUTO]
+REGEX_LOOKUP_LENGTH = 2000
+REGEX_LOOKUP_RATIO = 0.05
+
+# _ThrottledConnection Variables
+RETRY_LIMIT = 5
+RETRY_BACKOFF = 1
+
+# Concurrency Variables
+ASYNC_CONCURRENCY = 10
+HTTP_POOL_SIZE = 10
+
+# SyncJournal Variables
+JOURNAL_VERSION = 1
+
+# CommitQueue Variables
+COMMIT_ADD = "add"
+COMMIT_UPDATE = "update"
+COMMIT_DELETE = "delete"
+COMMIT_BATCH_SIZE = 0
+COMMIT_RATE = 0
+
+# SyncCache Variables
+CACHE_TTL = 3600
+CACHE_VERSION = 3
+
+# EntityIndex Records
+EntityRecord = namedtuple("EntityRecord", ["uuid", "name", "entity_type", "state"])
 
 ## ----------------------------------------------------
 ##   Error Classes
@@ -79,6 +147,12 @@ class DuplicateMatchingGroupError(MissingUUIDError):
     """
     pass
 
+class CommitConflictError(StaticGroupError):
+    """Raised when a change can't be merged with the change already queued
+    for the same group
+    """
+    pass
+
 class LookupNameError(StaticGroupError):
     """Base StaticGroup Lookup Name Exception.
     """
@@ -130,23 +204,24 @@ class GroupUpdateUtility(object):
                 index_key = index_key.lower()
             if len(values) == 0:
                 # Include all member attributes as values
-                v = member.keys()
+                entry = dict(member)
             else:
-                v = values
-            entry = {value: member[value] for value in v}
-            if index_key not in index:
-                index[index_key] = [entry]
-            else:
-                index[index_key].append([entry])
+                entry = {value: member.get(value) for value in values}
+            index.setdefault(index_key, []).append(entry)
         return index
 
-    def get_group_index(self, key="displayName", values=["uuid"]):
+    def get_group_index(self, key="displayName", values=["uuid"], names=None):
         """Creates an index of group values based on a group key.
 
         Args:
             key (str, optional): Key to index on,
             values (list, optional): Value keys to include in values. If empty,
                 all values are included.
+            names (list, optional): Group names to index. Groups are searched
+                by name with patterns of up to GROUP_FILTER_LENGTH characters.
+                If that takes more than GROUP_FILTER_REQUESTS searches, every
+                group is listed and only matching groups are kept. If None,
+                every group is indexed.
 
         Returns:
             Dictionary::
@@ -155,34 +230,43 @@ class GroupUpdateUtility(object):
                 "groupName": [{values}, {values}]
             }
         """
-        all_groups = self._conn.get_groups()
-        return self._index_objects(key, values, all_groups)
+        if names is None:
+            all_groups = self._conn.get_groups(fetch_all=True)
+            return self._index_objects(key, values, all_groups)
+        names = set(names)
+        patterns = _name_patterns(names, GROUP_FILTER_LENGTH)
+        if len(patterns) <= GROUP_FILTER_REQUESTS:
+            pages = (self._conn.search(dto=json.dumps(_name_filter("Group", pattern,
+                                                                   GROUP_NAME_FILTER)),
+                                       fetch_all=True)
+                     for pattern, _ in patterns)
+        else:
+            pages = _iter_pages(self._conn.get_groups(pager=True))
+        index = {}
+        for page in pages:
+            # Search patterns are regular expressions, keep exact names only
+            matching = [g for g in page if g.get("displayName") in names]
+            for index_key, entries in self._index_objects(key, values,
+                                                          matching).items():
+                index.setdefault(index_key, []).extend(entries)
+        return index
 
-    def get_entity_index(self, entity_types, key="displayName", values=[],
-                         case_sensitive=True):
-        """Creates an index of entities based on a group key.
+    def get_entity_index(self, entity_types, key="displayName", index=None):
+        """Creates an index of entities based on an entity key.
+
+        All entity types are fetched with a single search.
 
         Args:
             entity_types (list): List of entity_types,
             key (str, optional): Key to index on.
-            values (list, optional): Value keys to include in values. If empty,
-                all values are included.
-            case_sensitive (bool, optional): Group entities with/without case
-                sensitivity
+            index (EntityIndex, optional): Existing index to add entities to.
 
         Returns:
-            Dictionary::
-
-            {
-                "entity type": {"entity_key": [{values}, {values}]}
-            }
+            EntityIndex
         """
-        index = {}
-        all_entities = self._conn.search(types=entity_types)
-        for e_type in entity_types:
-            e = [e for e in all_entities if e["className"] == e_type]
-            index[e_type] = self._index_objects(key, values, e,
-                                                case_sensitive=case_sensitive)
+        if index is None:
+            index = EntityIndex(key=key)
+        index.add(self._conn.search(types=entity_types, fetch_all=True))
         return index
 
     def get_group_diff(self, group_uuid, utd_members, key="uuid"):
@@ -202,11 +286,84 @@ class GroupUpdateUtility(object):
             }
         """
         diffs = {}
-        cur_members = [e[key] for e in self._conn.get_group_members(group_uuid)]
+        cur_members = [e[key] for e in self._conn.get_group_members(group_uuid,
+                                                                      fetch_all=True)]
         diffs["add"] = list(set(utd_members).difference(set(cur_members)))
         diffs["remove"] = list(set(cur_members).difference(set(utd_members)))
         return diffs
 
+class GroupRegistry(object):
+    """Shared index of group names to uuids on a Turbonomic server.
+
+    StaticGroup instances given a registry check if their group exists with
+    it instead of searching groups by name, and update it when they add or
+    remove their group. All groups are listed once on first use.
+
+    Args:
+        conn (VMTConnection): VMTConnection instance to target Turbonomic Server.
+        group_index (dict, optional): Output of
+            GroupUpdateUtility.get_group_index with "uuid" values, indexing
+            at least every name the registry is used for. If not provided,
+            groups are listed on first use.
+    """
+    def __init__(self, conn, group_index=None):
+        self._conn = conn
+        self._lock = threading.Lock()
+        self._uuids = None
+        if group_index is not None:
+            self._uuids = self._index_uuids(group_index)
+
+    @staticmethod
+    def _index_uuids(group_index):
+        return {name: [g["uuid"] for g in groups]
+                for name, groups in group_index.items()}
+
+    def _index(self):
+        # Callers must hold self._lock
+        if self._uuids is None:
+            group_index = GroupUpdateUtility(self._conn).get_group_index()
+            self._uuids = self._index_uuids(group_index)
+        return self._uuids
+
+    def __contains__(self, name):
+        return len(self.get(name)) > 0
+
+    def get(self, name):
+        """Returns the uuids of groups matching name"""
+        with self._lock:
+            return list(self._index().get(name, []))
+
+    def add(self, name, uuid):
+        """Registers a group that was added"""
+        with self._lock:
+            uuids = self._index().setdefault(name, [])
+            if uuid not in uuids:
+                uuids.append(uuid)
+
+    def remove(self, name, uuid):
+        """Unregisters a group that was removed"""
+        with self._lock:
+            uuids = self._index().get(name, [])
+            if uuid in uuids:
+                uuids.remove(uuid)
+            if not uuids:
+                self._index().pop(name, None)
+
+    def refresh(self, name):
+        """Searches groups named exactly name again and replaces their uuids.
+
+        Returns:
+            List of groups whose display name is name, with every value
+            from vmtconnect.
+        """
+        groups = _groups_named(self._conn, name)
+        with self._lock:
+            if groups:
+                self._index()[name] = [g["uuid"] for g in groups]
+            else:
+                self._index().pop(name, None)
+        return groups
+
 class CSVGroupParser(object):
     """
         Parses a CSV and returns groupings based on headers
@@ -228,68 +385,53 @@ class CSVGroupParser(object):
         self.group_prefix = group_prefix
 
     @staticmethod
-    def _read_csv(file_path):
-        """Read CSV file
-
-        Args:
-            file_path (str): Path to CSV files
-
-        Returns:
-            List of dictionaries with CSV file headers as the keys
-        """
-        with open(file_path, mode='r', encoding='utf-8-sig') as csvfile:
-            reader = csv.DictReader(csvfile)
-            return [row for row in reader]
-
-    @staticmethod
-    def _group_values_by_key(dicts, group_keys, value_keys,
+    def _group_values_by_key(rows, group_cols, type_col, name_col,
                              group_prefix="", group_delimiter="_"):
-        """Groups value_keys that share the same group_key values.
+        """Buckets entity names by group name and entity type in one pass.
 
         Args:
-            dicts (list): List of dictionaries
-            group_keys (list): List of dictionary keys to group by.
-            value_keys (list): Dictionary keys for target value.
+            rows (iterable): CSV rows as lists of values.
+            group_cols (list): Column indexes to group by in order.
+            type_col (int): Column index of the entity type.
+            name_col (int): Column index of the entity name.
             group_prefix (str): String to prefix group name.
-            group_delimiter (str): String to separate group_keys in group name.
+            group_delimiter (str): String to separate group values in group name.
 
         Returns:
-            Dictionary where values are lists of entities that all share the same
-            'group_keys' values and the key is the common group_key values
-            separated by the group_delimiter::
+            Dictionary of groups in order of first appearance, each with the
+            entity names per entity type in order of first appearance::
 
                 {"group1_group2":
-                    ["object_value", "object_value2"]}
+                    {"entity_type": {"entity_name", "entity_name2"}}}
         """
         groups = {}
-        for row in dicts:
-            cur_groupings = []
-            if group_prefix:
-                cur_groupings.append(group_prefix)
-            for i, group_key in enumerate(group_keys):
-                if row[group_key] not in ["", None]:
-                    cur_groupings.append(row[group_key])
-                if i == len(group_keys)-1:
-                    group_name = group_delimiter.join(cur_groupings)
-                    if group_name not in groups:
-                        groups[group_name] = [{v: row[v] for v in value_keys}]
-                    else:
-                        groups[group_name] += [{v: row[v] for v in value_keys}]
-                else:
-                    if row[group_key] not in cur_groupings:
-                        cur_groupings.append(row[group_key])
+        width = max(group_cols + [type_col, name_col]) + 1
+        for row in rows:
+            if not row:
+                continue
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            group_name = CSVGroupParser._build_group_name([row[i] for i in group_cols],
+                                                          group_prefix,
+                                                          group_delimiter)
+            if group_name == "":
+                continue
+            entity_types = groups.setdefault(group_name, {})
+            entity_types.setdefault(row[type_col], set()).add(row[name_col])
         return groups
 
-    def parse(self, csv_file, group_headers=[]):
+    def parse(self, csv_file, group_headers=[], workers=1):
         """Create unique groups from additional columns in the csv
 
         Args:
-            csv_file (str): Path to csv file
+            csv_file (str): Path to csv file, see iter_groups
             group_headers (list, optional): List of headers to group from in order.
                 By default all headers in the csv are used in left to right order.
+            workers (int, optional): Number of processes parsing the csv, see
+                iter_groups.
 
         Returns:
-            List of dictionaries::
+            List of dictionaries in order of first appearance in the csv::
 
                 {
                  "name": ""
@@ -298,31 +440,161 @@ class CSVGroupParser(object):
                 }
 
         """
-        contents = self._read_csv(csv_file)
+        return list(self.iter_groups(csv_file, group_headers=group_headers,
+                                     workers=workers))
+
+    @staticmethod
+    def _iter_csv(file_path):
+        """Lazily read CSV file rows, decompressing and decoding as they are read
+
+        Args:
+            file_path (str): Path to CSV files
+
+        Yields:
+            List of values for each row, starting with the header row
+        """
+        with io.TextIOWrapper(_open_csv(file_path), encoding='utf-8-sig',
+                              newline='') as csvfile:
+            for row in csv.reader(csvfile):
+                yield row
+
+    @staticmethod
+    def _build_group_name(values, group_prefix="", group_delimiter="_"):
+        """Joins group column values of a single row into a group name.
+
+        Args:
+            values (list): Group column values in order.
+            group_prefix (str): String to prefix group name.
+            group_delimiter (str): String to separate values in group name.
+
+        Returns:
+            str: Group name, empty if there are no group columns
+        """
+        group_name = ""
+        cur_groupings = []
+        if group_prefix:
+            cur_groupings.append(group_prefix)
+        for i, value in enumerate(values):
+            if value not in ["", None]:
+                cur_groupings.append(value)
+            if i == len(values)-1:
+                group_name = group_delimiter.join(cur_groupings)
+            elif value not in cur_groupings:
+                cur_groupings.append(value)
+        return group_name
+
+    def _columns(self, header, group_headers):
+        """Returns group column indexes, type and name column indexes
+
+        Raises:
+            MissingHeaderError: If a required or group header is missing.
+        """
+        # Later duplicate headers take precedence, as with csv.DictReader
+        columns = {h: i for i, h in enumerate(header)}
         for h in [self.entity_name_header, self.entity_type_header]+group_headers:
-            if h not in contents[0].keys():
+            if h not in columns:
                 raise MissingHeaderError("Header '{}' could not be found".format(h))
 
         if len(group_headers) == 0:
-            group_headers = [h for h in contents[0].keys() if h not in [self.entity_name_header, self.entity_type_header]]
-        groups = self._group_values_by_key(contents, group_headers,
-                                         [self.entity_name_header, self.entity_type_header],
-                                         self.group_prefix, self.group_delimiter)
-        # Create Group Dicts
-        final_groups = []
-        for group, members in groups.items():
-            if group == "":
-                continue
-            entity_types = list(set([m[self.entity_type_header] for m in members]))
-            for e_type in entity_types:
-                g_members = []
-                for m in members:
-                    if m[self.entity_type_header] == e_type:
-                        g_members.append(m[self.entity_name_header])
-                final_groups.append({"name": group,
-                                     "entity_type": e_type,
-                                     "members": list(set(g_members))})
-        return final_groups
+            group_headers = [h for h in columns if h not in [self.entity_name_header, self.entity_type_header]]
+        return ([columns[h] for h in group_headers],
+                columns[self.entity_type_header],
+                columns[self.entity_name_header])
+
+    def _parallel_groups(self, csv_file, group_headers, workers):
+        """Groups the csv in byte ranges across a process pool.
+
+        The file is split at record boundaries into at least one range per
+        worker and at most PARSE_CHUNK_SIZE bytes per range. Each range is
+        grouped in a worker process and the partial groups are merged in
+        file order, so groups are the same as with a single process.
+
+        Returns:
+            None if the file has bare carriage returns, as records can then
+            only be split by the csv reader and must be parsed serially.
+        """
+        import mmap
+        with open(csv_file, "rb") as csv_in:
+            size = os.fstat(csv_in.fileno()).st_size
+            if size == 0:
+                # Raises for the missing headers
+                self._columns([], group_headers)
+            with mmap.mmap(csv_in.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                # Ranges are split at newlines, which CR terminated records lack
+                if re.search(rb"\r(?!\n)", data):
+                    return None
+                data_start = 3 if data[:3] == codecs.BOM_UTF8 else 0
+                header_end = _csv_record_end(data, data_start)
+                header = next(csv.reader(io.StringIO(
+                    data[data_start:header_end].decode("utf-8"), newline="")), [])
+                ranges = _csv_ranges(data, header_end,
+                                     max(workers, -(-size // PARSE_CHUNK_SIZE)))
+        columns = self._columns(header, group_headers)
+
+        # Deferred, multiprocessing is slow to import and only needed here
+        from concurrent.futures import ProcessPoolExecutor
+        group_range = partial(_group_csv_range, csv_file, columns=columns,
+                              group_prefix=self.group_prefix,
+                              group_delimiter=self.group_delimiter)
+        groups = {}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for range_groups in executor.map(group_range,
+                                             [start for start, _ in ranges],
+                                             [end for _, end in ranges]):
+                for group_name, entity_types in range_groups.items():
+                    merged = groups.setdefault(group_name, {})
+                    for e_type, members in entity_types.items():
+                        merged.setdefault(e_type, set()).update(members)
+        return groups
+
+    def iter_groups(self, csv_file, group_headers=[], workers=1):
+        """Streams the csv and yields unique groups without loading every row.
+
+        Only group name, entity type and member names are kept in memory.
+
+        Args:
+            csv_file (str): Path to csv file. Paths ending in .gz, .bz2 or .xz
+                are decompressed as they are read, and STDIN_CSV reads stdin.
+            group_headers (list, optional): List of headers to group from in order.
+                By default all headers in the csv are used in left to right order.
+            workers (int, optional): Number of processes parsing the csv. If
+                greater than 1, the csv is memory-mapped and split into byte
+                ranges at record boundaries, including quoted newlines, which
+                are grouped in parallel. Yields the same groups as a single
+                process. Capped at the number of CPUs, compressed files, stdin
+                and files with bare carriage returns are always parsed by a
+                single process.
+
+        Yields:
+            Dictionaries::
+
+                {
+                 "name": ""
+                 "entity_type": ""
+                 "members": []
+                }
+
+        Raises:
+            MissingHeaderError: If a required or group header is missing.
+        """
+        workers = min(workers, os.cpu_count() or 1)
+        groups = None
+        # Only plain files can be memory-mapped and split
+        if workers > 1 and csv_file != STDIN_CSV and \
+                os.path.splitext(csv_file)[1].lower() not in CSV_OPENERS:
+            groups = self._parallel_groups(csv_file, group_headers, workers)
+        if groups is None:
+            rows = self._iter_csv(csv_file)
+            groups = self._group_values_by_key(rows,
+                                               *self._columns(next(rows, []),
+                                                              group_headers),
+                                               group_prefix=self.group_prefix,
+                                               group_delimiter=self.group_delimiter)
+        for group_name, entity_types in groups.items():
+            for e_type, members in entity_types.items():
+                yield {"name": group_name,
+                       "entity_type": e_type,
+                       "members": list(members)}
 
 class StaticGroup(object):
     """Object that helps create/update/remove a static group in Turbonomic
@@ -335,13 +607,24 @@ class StaticGroup(object):
             (VirtualMachine, PhysicalMachine, etc).
         uuid (str, optional): UUID of group if already exists. If not provided,
             retrieval will be attempted before operations that require it.
+        entity_index (EntityIndex, optional): Index used to match member names
+            to uuids. If not provided, each name is searched on the server.
+        registry (GroupRegistry, optional): Registry used to check if the
+            group exists, updated when the group is added or removed. If not
+            provided, groups are searched by name on the server.
+        memo (ResolutionMemo, optional): Memo of names already matched,
+            shared with other groups so each name is looked up only once.
 
     """
-    def __init__(self, conn, name, entity_type, members=[], uuid=None):
+    def __init__(self, conn, name, entity_type, members=[], uuid=None,
+                 entity_index=None, registry=None, memo=None):
         self.name = name
         self.members = members
         self.entity_type = entity_type
         self.uuid = uuid
+        self.entity_index = entity_index
+        self.registry = registry
+        self.memo = memo
         self.__conn = conn
 
     def _requires_uuid(func):
@@ -380,7 +663,7 @@ class StaticGroup(object):
 
     @_requires_uuid
     def remove_entities(self, members, lookup_names=False, case_sensitive=True,
-                        dryrun=False):
+                        dryrun=False, strict=True):
         """Removes specified members from the current group membership
 
         Args:
@@ -389,6 +672,9 @@ class StaticGroup(object):
                 the Turbonomic server that match the entity names in self.members
             case_sensitive (bool, optional): If False and lookup_names is True,
                 names will be matched without case sensitivity.
+            strict (bool, optional): If False and lookup_names is True, names
+                that don't match a single entity are skipped with a warning
+                instead of raising.
 
         Returns:
             vmtconnect response object
@@ -397,7 +683,8 @@ class StaticGroup(object):
         if lookup_names:
             # Match displayNames to uuids
             entities_to_remove = self._match_names_to_uuid(entities_to_remove,
-                                                           case_sensitive=case_sensitive)
+                                                           case_sensitive=case_sensitive,
+                                                           strict=strict)
         cur_members = [m["uuid"] for m in self.get_current_members()]
         # Remove current group members that are specified in members
         new_members = list(set(cur_members).difference(set(entities_to_remove)))
@@ -408,7 +695,7 @@ class StaticGroup(object):
 
     @_requires_uuid
     def add_entities(self, members, lookup_names=False, case_sensitive=True,
-                     dryrun=False):
+                     dryrun=False, strict=True):
         """Adds specified members to the current group membership
 
         Args:
@@ -417,6 +704,9 @@ class StaticGroup(object):
                 the Turbonomic server that match the entity names in self.members
             case_sensitive (bool, optional): If False and lookup_names is True,
                 names will be matched without case sensitivity.
+            strict (bool, optional): If False and lookup_names is True, names
+                that don't match a single entity are skipped with a warning
+                instead of raising.
 
         Returns:
             vmtconnect response object
@@ -425,7 +715,8 @@ class StaticGroup(object):
         if lookup_names:
             # Match displayNames to uuids
             entities_to_add = self._match_names_to_uuid(entities_to_add,
-                                                           case_sensitive=case_sensitive)
+                                                           case_sensitive=case_sensitive,
+                                                           strict=strict)
         cur_members = [m["uuid"] for m in self.get_current_members()]
         # Add current group member to add new members
         new_members = list(set(cur_members+entities_to_add))
@@ -436,7 +727,7 @@ class StaticGroup(object):
 
     @_requires_uuid
     def update(self, allow_add=True, allow_remove=True, lookup_names=False,
-               case_sensitive=True, dryrun=False):
+               case_sensitive=True, dryrun=False, plan=None, strict=True):
         """Adds/Removes members on the static group on the Turbonomic server.
 
         Args:
@@ -448,32 +739,87 @@ class StaticGroup(object):
                 the Turbonomic server that match the entity names in self.members
             case_sensitive (bool, optional): If False and lookup_names is True,
                 names will be matched without case sensitivity.
+            strict (bool, optional): If False and lookup_names is True, names
+                that don't match a single entity are skipped with a warning
+                instead of raising.
             dryrun (bool, optional): If True, no changes are committed to
                 the Turbonomic server
+            plan (dict, optional): Output of self.plan() to commit. If provided,
+                all other membership arguments are ignored and current
+                members are not fetched again.
 
         Returns:
             vmtconnect response object
         """
-        entities_to_update = self.members
-        if lookup_names:
-            # Match displayNames to uuids
-            entities_to_update = self._match_names_to_uuid(entities_to_update,
-                                                           case_sensitive=case_sensitive)
-        new_members = []
-        if allow_add is True and allow_remove is True:
+        if plan is not None:
+            new_members = plan["members"]
+        elif allow_add is True and allow_remove is True:
             # Completely replace group members
-            new_members = entities_to_update
+            new_members = self.members
+            if lookup_names:
+                # Match displayNames to uuids
+                new_members = self._match_names_to_uuid(new_members,
+                                                        case_sensitive=case_sensitive,
+                                                        strict=strict)
         else:
-            cur_members = [m["uuid"] for m in self.get_current_members()]
-            if allow_add is True:
-                # Add current group member to add new members
-                new_members = list(set(cur_members+entities_to_update))
-            if allow_remove is True:
-                # Remove current group members that are specified in entities_to_update
-                new_members = list(set(cur_members).difference(set(entities_to_update)))
+            new_members = self.plan(allow_add=allow_add,
+                                    allow_remove=allow_remove,
+                                    lookup_names=lookup_names,
+                                    case_sensitive=case_sensitive,
+                                    strict=strict)["members"]
         if not dryrun:
-            self.__conn.update_static_group_members(self.uuid, new_members,
-                                                    name=self.name, type=self.entity_type)
+            return self.__conn.update_static_group_members(self.uuid, new_members,
+                                                           name=self.name,
+                                                           type=self.entity_type)
+
+    def plan(self, current_members=None, allow_add=True, allow_remove=True,
+             lookup_names=False, case_sensitive=True, strict=True):
+        """Calculates the membership changes needed to match self.members.
+
+        Args:
+            current_members (list, optional): Current member uuids of the
+                group. If not provided, they are fetched from the Turbonomic
+                server.
+            allow_add (bool, optional): If True, new members are added.
+            allow_remove (bool, optional): If True, current members that are
+                not in self.members are removed.
+            lookup_names (bool, optional): If True uuids will be collected from
+                the Turbonomic server that match the entity names in self.members
+            case_sensitive (bool, optional): If False and lookup_names is True,
+                names will be matched without case sensitivity.
+            strict (bool, optional): If False and lookup_names is True, names
+                that don't match a single entity are skipped with a warning
+                instead of raising.
+
+        Returns:
+            Dictionary that can be passed to self.update()::
+
+            {
+                "add": ["uuid", "uuid"],
+                "remove": ["uuid", "uuid"],
+                "members": ["uuid", "uuid"]
+            }
+        """
+        desired_members = self.members
+        if lookup_names:
+            # Match displayNames to uuids
+            desired_members = self._match_names_to_uuid(desired_members,
+                                                        case_sensitive=case_sensitive,
+                                                        strict=strict)
+        if current_members is None:
+            current_members = [m["uuid"] for m in self.get_current_members()]
+        desired_members = set(desired_members)
+        current_members = set(current_members)
+        to_add = set()
+        to_remove = set()
+        if allow_add is True:
+            to_add = desired_members.difference(current_members)
+        if allow_remove is True:
+            to_remove = current_members.difference(desired_members)
+        return {"add": list(to_add),
+                "remove": list(to_remove),
+                "members": list(current_members.union(to_add).difference(to_remove))}
+
     @_requires_uuid
     def remove(self, dryrun=False):
         """Deletes the group from the Turbonomic server.
@@ -487,11 +833,14 @@ class StaticGroup(object):
         """
         if not dryrun:
             resp = self.__conn.del_group(self.uuid)
+            if self.registry is not None:
+                self.registry.remove(self.name, self.uuid)
             self.uuid = None
             return resp
 
     @_requires_no_uuid
-    def add(self, lookup_names=False, case_sensitive=True, dryrun=False):
+    def add(self, lookup_names=False, case_sensitive=True, dryrun=False,
+            strict=True):
         """Adds the group to the Turbonomic server.
 
         Args:
@@ -499,6 +848,9 @@ class StaticGroup(object):
                 the Turbonomic server that match the entity names in self.members
             dryrun (bool, optional): If True, will not commit changes to
                 the Turbonomic server
+            strict (bool, optional): If False and lookup_names is True, names
+                that don't match a single entity are skipped with a warning
+                instead of raising.
 
         Returns:
             vmtconnect response object
@@ -507,10 +859,15 @@ class StaticGroup(object):
         if lookup_names:
             # Match displayNames to uuids
             entities_to_add = self._match_names_to_uuid(entities_to_add,
-                                                        case_sensitive=case_sensitive)
+                                                        case_sensitive=case_sensitive,
+                                                        strict=strict)
         if not dryrun:
-            return self.__conn.add_static_group(self.name, self.entity_type,
+            resp = self.__conn.add_static_group(self.name, self.entity_type,
                                                 entities_to_add)
+            uuid = _response_uuid(resp)
+            if self.registry is not None and uuid is not None:
+                self.registry.add(self.name, uuid)
+            return resp
 
     def add_or_update(self, **kwargs):
         """Helper function to update group if it already exists or add it
@@ -537,7 +894,7 @@ class StaticGroup(object):
         Returns:
             vmtconnect response object
         """
-        return self.__conn.get_group_members(self.uuid)
+        return self.__conn.get_group_members(self.uuid, fetch_all=True)
 
     def exists(self):
         """Checks if group already exists in target environment.
@@ -551,26 +908,96 @@ class StaticGroup(object):
         except MissingUUIDError:
             return False
 
-    def _match_names_to_uuid(self, names, case_sensitive):
+    def resolve_names(self, names, case_sensitive=True, active_only=False):
+        """Matches display names to uuids in a single pass.
+
+        Names are matched with self.memo first, then with
+        self.entity_index. Without an index, fewer than NAME_SEARCH_LIMIT
+        names are searched with name patterns of up to REGEX_LOOKUP_LENGTH
+        characters, otherwise every entity of self.entity_type is fetched
+        with a single search and kept as self.entity_index for later lookups.
+
+        Args:
+            names (list): Entity names to match.
+            case_sensitive (bool, optional): If False, names will be matched
+                without case sensitivity.
+            active_only (bool, optional): If True and multiple entities match,
+                the only ACTIVE entity is used.
+
+        Returns:
+            Dictionary as returned by EntityIndex.partition::
+
+            {
+                "matched": {"name": "uuid"},
+                "missing": ["name"],
+                "ambiguous": {"name": ["uuid", "uuid"]}
+            }
+        """
+        names = _unique(names)
+        matches = {}
+        if self.memo is not None:
+            for name in names:
+                uuids = self.memo.get(self.entity_type, name,
+                                      case_sensitive=case_sensitive,
+                                      active_only=active_only)
+                if uuids is not None:
+                    matches[name] = uuids
+        unresolved = [name for name in names if name not in matches]
+
+        index = self.entity_index
+        if index is None and 0 < len(unresolved) < NAME_SEARCH_LIMIT:
+            index = EntityIndex()
+            found = set()
+            for pattern, pattern_names in _name_patterns(unresolved,
+                                                         REGEX_LOOKUP_LENGTH):
+                found_matches = _search_names(self.__conn, self.entity_type,
+                                              pattern, pattern_names,
+                                              case_sensitive=case_sensitive)
+                # Case-insensitive patterns can return an entity more than once
+                index.add([m for m in found_matches if m["uuid"] not in found])
+                found.update(m["uuid"] for m in found_matches)
+        elif index is None and unresolved:
+            index = EntityIndex(self.__conn.search(types=[self.entity_type],
+                                                   fetch_all=True))
+            self.entity_index = index
+        for name in unresolved:
+            matches[name] = index.match_uuids(self.entity_type, name,
+                                              case_sensitive=case_sensitive,
+                                              active_only=active_only)
+            if self.memo is not None:
+                self.memo.set(self.entity_type, name, matches[name],
+                              case_sensitive=case_sensitive,
+                              active_only=active_only)
+        return _partition_matches((name, matches[name]) for name in names)
+
+    def _match_names_to_uuid(self, names, case_sensitive, strict=True):
         """Matches display names to uuids
 
+        Args:
+            strict (bool, optional): If False, names that don't match a single
+                entity are skipped with a warning instead of raising.
+
         Raises:
-            NameMatchError: If an entity can't be found by name
+            NameMatchError: If entities can't be found by name
             MultipleMatchingNamesError: If multiple entities match a name
         """
-        uuids = []
-        for name in names:
-            matches = self.__conn.search_by_name(name, type=self.entity_type,
-                                                 case_sensitive=case_sensitive,
-                                                fetch_all=True)
-            if len(matches) == 0:
-                raise NameMatchError("Unable to find uuid for {}".format(name))
-            if len(matches) > 1:
-                raise MultipleMatchingNamesError("Multiple {} with the name"
-                                                 " {}".format(self.entity_type,
-                                                              name))
-            uuids.append(matches[0]["uuid"])
-        return uuids
+        resolution = self.resolve_names(names, case_sensitive=case_sensitive)
+        missing = resolution["missing"]
+        ambiguous = list(resolution["ambiguous"])
+        if strict and missing:
+            raise NameMatchError("Unable to find uuid for"
+                                 " {}".format(_name_list(missing)))
+        if strict and ambiguous:
+            raise MultipleMatchingNamesError("Multiple {} with the name"
+                                             " {}".format(self.entity_type,
+                                                          _name_list(ambiguous)))
+        for name in missing:
+            _msg("Unable to find uuid for {}".format(name), warn=True)
+        for name in ambiguous:
+            _msg("Multiple {} with the name {}".format(self.entity_type, name),
+                 warn=True)
+        matched = resolution["matched"]
+        return [matched[name] for name in names if name in matched]
 
     def _get_group_uuid(self):
         """Fetches uuid if not already present and assigns to self.uuid
@@ -584,278 +1011,2551 @@ class StaticGroup(object):
                 the same name.
         """
         if self.uuid is None:
-            group = self.__conn.get_group_by_name(self.name)
-            if group is not None:
-                if len(group) == 1:
-                    self.uuid = group[0]["uuid"]
-                    return self.uuid
-                elif len(group) > 1:
-                    raise DuplicateMatchingGroupError("Found multiple groups"
-                                                      " matching name"
-                                                      " {}".format(self.name))
+            if self.registry is not None:
+                group = [{"uuid": uuid} for uuid in self.registry.get(self.name)]
+            else:
+                # vmtconnect's get_group_by_name returns the first partial match
+                group = _groups_named(self.__conn, self.name)
+            if len(group) == 1:
+                self.uuid = group[0]["uuid"]
+                return self.uuid
+            elif len(group) > 1:
+                raise DuplicateMatchingGroupError("Found multiple groups"
+                                                  " matching name"
+                                                  " {}".format(self.name))
             raise NoMatchingGroupError("No group found matching"
                                        " name '{}'".format(self.name))
         return self.uuid
 
-## ----------------------------------------------------
-##   Internal Utility Classes and Functions
-## ----------------------------------------------------
+class EntityIndex(object):
+    """Compact index of Turbonomic entities by entity type and name.
 
-# Logging
-class _EventTracker(object):
-    """Utility Object to store and log events by categories
+    Entities are stored as EntityRecord tuples, partitioned by className in a
+    single pass. A case-folded index of each entity type is built on first
+    case-insensitive lookup.
+
+    Args:
+        entities (list, optional): List of entity dictionaries as returned by
+            VMTConnection.search.
+        key (str, optional): Entity attribute to index on.
     """
-    def __init__(self, name=None):
-        self.name = name
-        self.__changes = {}
+    def __init__(self, entities=[], key="displayName"):
+        self.key = key
+        self._index = {}
+        self._folded_index = {}
+        self.add(entities)
 
-    def __add_change_object(self, category):
-        if category not in self.__changes.keys():
-            self.__changes[category] = {"total":0,"events":[]}
+    @staticmethod
+    def _insert(index, key, record):
+        # Unique keys store the record itself, duplicates store a tuple
+        cur = index.get(key)
+        if cur is None:
+            index[key] = record
+        elif isinstance(cur, EntityRecord):
+            index[key] = (cur, record)
+        else:
+            index[key] = cur + (record,)
 
-    def track(self, category, event=(), msg=True, **kwargs):
-        self.__add_change_object(category)
-        self.__changes[category]["total"] += 1
-        if event:
-            # TODO If expanding dictionary, move tuple conversion
-            # to static method
-            self.__changes[category]["events"].append({"group name":event[0],
-                                                       "message": event[1]})
-            if msg:
-                _msg(event[1], **kwargs)
+    @staticmethod
+    def _as_tuple(entry):
+        if entry is None:
+            return ()
+        if isinstance(entry, EntityRecord):
+            return (entry,)
+        return entry
 
-    def to_dict(self):
-        return self.__changes
+    def add(self, entities):
+        """Adds entities to the index.
 
-def _msg(msg, end='\n', logger=None, level=None, exc_info=False, warn=False,
-         error=False):
-    """Message handler"""
-    global LOGGER, QUIET, TRACE, WARN
+        Args:
+            entities (list): List of entity dictionaries.
+        """
+        for e in entities:
+            record = EntityRecord(e["uuid"], e[self.key], e["className"],
+                                  e.get("state"))
+            self._insert(self._index.setdefault(record.entity_type, {}),
+                         record.name, record)
+            folded = self._folded_index.get(record.entity_type)
+            if folded is not None:
+                self._insert(folded, record.name.casefold(), record)
+
+    def _get_folded(self, entity_type):
+        folded = self._folded_index.get(entity_type)
+        if folded is None:
+            folded = {}
+            for entry in self._index.get(entity_type, {}).values():
+                for record in self._as_tuple(entry):
+                    self._insert(folded, record.name.casefold(), record)
+            self._folded_index[entity_type] = folded
+        return folded
+
+    @property
+    def entity_types(self):
+        """List of indexed entity types."""
+        return list(self._index)
+
+    def __contains__(self, entity_type):
+        return entity_type in self._index
+
+    def __len__(self):
+        return sum(len(self._as_tuple(entry)) for names in self._index.values()
+                   for entry in names.values())
+
+    def records(self, entity_type):
+        """Iterates over every indexed entity of entity_type.
+
+        Yields:
+            EntityRecord
+        """
+        for entry in self._index.get(entity_type, {}).values():
+            for record in self._as_tuple(entry):
+                yield record
 
-    empty_trace = (None, None, None)
+    def names(self, entity_type):
+        """Set of all names indexed for entity_type."""
+        return set(self._index.get(entity_type, {}))
 
-    if logger is None:
-        logger = LOGGER
+    def uuids(self, entity_type):
+        """Set of all uuids indexed for entity_type."""
+        return set(r.uuid for r in self.records(entity_type))
 
-    if TRACE and sys.exc_info() != empty_trace:
-        exc_info = True
+    def lookup_all(self, entity_type, name, case_sensitive=True):
+        """Get every entity of entity_type that matches name.
 
-    if warn:
-        level = "warn"
+        Returns:
+            Tuple of EntityRecord, empty if there are no matches.
+        """
+        if case_sensitive:
+            return self._as_tuple(self._index.get(entity_type, {}).get(name))
+        return self._as_tuple(self._get_folded(entity_type).get(name.casefold()))
 
-    if logger:
-        if level == 'critical':
-            logger.critical(msg, exc_info=exc_info)
-        elif level == 'error':
-            logger.error(msg, exc_info=exc_info)
-        elif level == 'warn' or level == 'warning':
-            logger.warning(msg, exc_info=exc_info)
-        elif level == 'debug':
-            logger.debug(msg, exc_info=exc_info)
-        else:
-            logger.info(msg, exc_info=exc_info)
+    def lookup_unique(self, entity_type, name, case_sensitive=True,
+                      active_only=False):
+        """Matches a single name to a uuid.
 
-    if not QUIET or error:
-        if warn and not WARN:
-            pass
-        else:
-            if warn:
-                msg = "Warning: {}".format(msg)
-            print(msg, end=end)
+        Args:
+            entity_type (str): Type of entity.
+            name (str): Name to match.
+            case_sensitive (bool, optional): If False, names will be matched
+                without case sensitivity.
+            active_only (bool, optional): If True and multiple entities match,
+                the only ACTIVE entity is used.
 
-def _log_summary(change_dict, dryrun, ignore_total=[]):
-    summary_bar = "="*15
-    title = "    Summary    "
-    dryrun_status = ""
-    if dryrun:
-        dryrun_status = "-dryrun enabled"
-    operations = []
-    total = 0
-    for category, attr in change_dict.items():
-        operations.append("{}: {}".format(category, attr["total"]))
-        if category not in ignore_total:
-            total += attr["total"]
-    operations = "\n".join(operations)
-    summary_str = "\n".join(["",summary_bar, title, summary_bar, dryrun_status,
-                            operations, summary_bar])
-    _msg(summary_str, level="info")
+        Returns:
+            str: uuid of the matching entity
 
-# Config Parsing
-def _config_to_args(config, args_dict, ignore=[]):
-    config_dict = json.load(open(config))
-    for i in ignore:
-        if i in config_dict.keys():
-            config_dict.pop(i)
-    args_dict.update(config_dict)
-    return args_dict
+        Raises:
+            NameMatchError: If an entity can't be found by name
+            MultipleMatchingNamesError: If multiple entities match a name
+        """
+        return _unique_uuid(entity_type, name,
+                            self.match_uuids(entity_type, name,
+                                             case_sensitive=case_sensitive,
+                                             active_only=active_only),
+                            active_only=active_only)
 
-## ----------------------------------------------------
-##   Main Function
-## ----------------------------------------------------
+    def match_uuids(self, entity_type, name, case_sensitive=True,
+                    active_only=False):
+        """Get uuids of every entity matching a name.
 
-def main(conn, csv_file, entity_type_header=ENTITY_TYPE_HEADER,
-         entity_name_header=ENTITY_NAME_HEADER, group_headers=[],
-         no_add=False, no_remove=False, delete=False, case_sensitive=True,
-         group_delimiter=GROUP_DELIMITER, dryrun=False, active_only=False):
-    """
-        Parses groups from CSV and adds/updates/deletes groups.
-        Efficiently collects group and entity uuids to minimize api requests.
+        Args:
+            entity_type (str): Type of entity.
+            name (str): Name to match.
+            case_sensitive (bool, optional): If False, names will be matched
+                without case sensitivity.
+            active_only (bool, optional): If True and multiple entities match,
+                only the uuid of the single ACTIVE entity is returned.
 
-    Args:
-        conn (VMTConnection): VMTConnection instance to target Turbonomic Server
-        csv_file (str): Path to Target CSV
-        entity_type_header (str, optional): CSV header for column that contains
-            entity types.
-        entity_name_header (str, optional): CSV header for column that contains
-            entity names.
-        group_headers (list, optional): List of CSV headers to group members by
-            in order. If empty list, all headers except entity_type_header, and
-            entity_name_header are used from left to right.
-        no_add (bool, optional): If True, adding current entities to group is
-            disabled.
-        no_remove (bool, optional): If True, removing current entities from a
-            group is disabled
-        delete (bool, optional): If True, groups matching names from csv are
-            deleted
-        case_sensitive (bool, optional): If True, entities will be matched with
-            case-sensitivity
-        dryrun (bool, optional): If True, changes are not committed to the
-            target Turbonomic server.
+        Returns:
+            List of uuids, empty if no entity matches.
+        """
+        matches = self.lookup_all(entity_type, name,
+                                  case_sensitive=case_sensitive)
+        if len(matches) > 1 and active_only:
+            active = [m for m in matches if m.state == "ACTIVE"]
+            if len(active) == 1:
+                matches = active
+        return [m.uuid for m in matches]
+
+    def partition(self, entity_type, names, case_sensitive=True,
+                  active_only=False):
+        """Matches names to uuids in a single pass.
 
-    Returns:
-        Dictionary with change events and totals for each change category
+        Args:
+            entity_type (str): Type of entity.
+            names (list): Names to match.
+            case_sensitive (bool, optional): If False, names will be matched
+                without case sensitivity.
+            active_only (bool, optional): If True and multiple entities match,
+                the only ACTIVE entity is used.
 
-        e.g. ::
+        Returns:
+            Dictionary of names matching a single entity, names without a
+            match and names matching multiple entities::
 
-            {"Change Category A": {
-                 "total": int
-                 "events":[
-                     {"group name": str,
-                      "message": str}
-                    ]
-                }}
+            {
+                "matched": {"name": "uuid"},
+                "missing": ["name"],
+                "ambiguous": {"name": ["uuid", "uuid"]}
+            }
+        """
+        return _partition_matches((name, self.match_uuids(entity_type, name,
+                                                          case_sensitive=case_sensitive,
+                                                          active_only=active_only))
+                                  for name in _unique(names))
+
+class ResolutionMemo(object):
+    """Per run memo of entity names matched to uuids.
+
+    Keeps the uuids every name matched, including names that matched no
+    entity or several entities, so a distinct name is looked up at most
+    once however many groups list it. Names are keyed by entity type, name
+    and case mode, case-insensitive names are casefolded like EntityIndex
+    matches them.
+
+    Attributes:
+        hits (int): Lookups answered by the memo.
+        misses (int): Lookups of names not in the memo.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._uuids = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(entity_type, name, case_sensitive=True, active_only=False):
+        """Returns the memo key of a name"""
+        if not case_sensitive:
+            name = name.casefold()
+        return (entity_type, name, case_sensitive, active_only)
+
+    def get(self, entity_type, name, case_sensitive=True, active_only=False):
+        """Get the uuids a name matched, counting a hit or a miss.
+
+        Returns:
+            List of uuids, empty if no entity matched. None if the name is
+            not in the memo.
+        """
+        key = self.key(entity_type, name, case_sensitive, active_only)
+        with self._lock:
+            uuids = self._uuids.get(key)
+            if uuids is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return uuids
+
+    def set(self, entity_type, name, uuids, case_sensitive=True,
+            active_only=False):
+        """Stores the uuids a name matched, an empty list if none matched"""
+        key = self.key(entity_type, name, case_sensitive, active_only)
+        with self._lock:
+            self._uuids[key] = list(uuids)
+
+    def to_dict(self):
+        """Returns hit and miss counts::
+
+            {"hits": int, "misses": int, "names": int}
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses,
+                    "names": len(self._uuids)}
+
+class EntityNameResolver(object):
+    """Resolves entity display names to uuids.
+
+    With the bulk lookup method, every entity of a type is fetched once and
+    names are resolved from an EntityIndex. The name lookup method
+    searches the Turbonomic server once per name. The regex lookup method
+    searches many names at once with anchored name patterns, which is
+    faster for small csvs against very large environments. The auto
+    lookup method picks the regex or bulk method for each entity type, see
+    prefetch_names.
+
+    Args:
+        conn (VMTConnection): VMTConnection instance to target Turbonomic Server.
+        case_sensitive (bool, optional): If False, names will be matched
+            without case sensitivity.
+        active_only (bool, optional): If True and multiple entities share a
+            name, the only ACTIVE entity is used.
+        method (str, optional): Lookup method, LOOKUP_BULK, LOOKUP_NAME,
+            LOOKUP_REGEX or LOOKUP_AUTO.
+        cache (SyncCache, optional): Cache to load/store bulk entity listings.
+        memo (ResolutionMemo, optional): Memo of names already searched by
+            the name or regex lookup methods, a new memo is used if not
+            provided.
+    """
+    def __init__(self, conn, case_sensitive=True, active_only=False,
+                 method=LOOKUP_BULK, cache=None, memo=None):
+        if method not in LOOKUP_METHODS:
+            raise ValueError("Unknown lookup method '{}'".format(method))
+        self.case_sensitive = case_sensitive
+        self.active_only = active_only
+        self.method = method
+        self.cache = cache
+        self.memo = memo if memo is not None else ResolutionMemo()
+        self.index = EntityIndex()
+        self._conn = conn
+        self._group_utils = GroupUpdateUtility(conn)
+        self._fetched_types = set()
+        self._type_methods = {}
+
+    def prefetch(self, entity_types):
+        """Indexes all entities of the given types with a single search.
+
+        Only used by the bulk lookup method, or the auto lookup method for
+        entity types it picked the bulk method for. Entity types already
+        indexed or cached are not fetched again.
+
+        Args:
+            entity_types (list): List of entity types.
+        """
+        entity_types = [e_type for e_type in entity_types
+                        if self.type_method(e_type) == LOOKUP_BULK]
+        new_types = list(set(entity_types).difference(self._fetched_types))
+        if self.cache is not None:
+            for e_type in list(new_types):
+                entities = self.cache.get_entities(e_type)
+                if entities is not None:
+                    self.index.add(entities)
+                    self._fetched_types.add(e_type)
+                    new_types.remove(e_type)
+        if not new_types:
+            return
+        self._group_utils.get_entity_index(new_types, index=self.index)
+        self._fetched_types.update(new_types)
+        if self.cache is not None:
+            for e_type in new_types:
+                self.cache.set_entities(e_type, self.index.records(e_type))
+
+    def type_method(self, entity_type):
+        """Returns the lookup method used for entity_type.
+
+        With the auto lookup method, this is the method picked by
+        prefetch_names, LOOKUP_BULK if it has not seen the entity type.
+        """
+        if self.method != LOOKUP_AUTO:
+            return self.method
+        return self._type_methods.get(entity_type, LOOKUP_BULK)
+
+    def _estate_sizes(self, entity_types):
+        """Number of entities of each type on the server, empty if unknown"""
+        try:
+            chains = self._conn.get_supplychains(["Market"], types=entity_types)
+        except Exception as e:
+            _msg("Could not count entities: {}".format(e), level="debug")
+            return {}
+        sizes = Counter()
+        for chain in chains or []:
+            for e_type, attr in chain.get("seMap", {}).items():
+                sizes[e_type] += attr.get("entitiesCount", 0)
+        return sizes
+
+    def _pick_methods(self, names):
+        """Picks the regex or bulk lookup method for each entity type"""
+        new_types = [e_type for e_type in names if e_type not in self._type_methods]
+        if self.cache is not None:
+            # Cached listings answer without any requests
+            for e_type in list(new_types):
+                if self.cache.has_entities(e_type):
+                    self._type_methods[e_type] = LOOKUP_BULK
+                    new_types.remove(e_type)
+        if not new_types:
+            return
+        sizes = self._estate_sizes(new_types)
+        for e_type in new_types:
+            # Without a name filter type, regex lookups search name by name
+            if _entity_filter_type(e_type) is not None and \
+                    len(names[e_type]) < sizes.get(e_type, 0) * REGEX_LOOKUP_RATIO:
+                self._type_methods[e_type] = LOOKUP_REGEX
+            else:
+                self._type_methods[e_type] = LOOKUP_BULK
+
+    def _search_patterns(self, entity_type, pattern_names):
+        """Searches a name pattern and memoizes the uuids of its names.
+
+        Returns:
+            Dictionary of names to lists of matching uuids.
+        """
+        pattern, names = pattern_names
+        index = EntityIndex(_search_names(self._conn, entity_type, pattern, names,
+                                          case_sensitive=self.case_sensitive))
+        matches = {}
+        for name in names:
+            matches[name] = index.match_uuids(entity_type, name,
+                                              case_sensitive=self.case_sensitive,
+                                              active_only=self.active_only)
+            self.memo.set(entity_type, name, matches[name],
+                          case_sensitive=self.case_sensitive,
+                          active_only=self.active_only)
+        return matches
+
+    def prefetch_names(self, names, workers=1):
+        """Fetches the entities needed to resolve the given names.
+
+        The regex lookup method searches the names of each entity type with
+        anchored patterns of up to REGEX_LOOKUP_LENGTH characters, and
+        matches the results to the names locally. The auto lookup method
+        uses the regex method for entity types with fewer distinct names
+        than REGEX_LOOKUP_RATIO of the type's entities on the server, and
+        the bulk method otherwise, or if the type is cached. The bulk method
+        prefetches the entity types, the name method fetches nothing.
+
+        Args:
+            names (dict): Entity types mapped to lists of names.
+            workers (int, optional): Number of searches to run concurrently.
+        """
+        distinct = {}
+        for e_type, type_names in names.items():
+            type_distinct = distinct.setdefault(e_type, {})
+            for name in type_names:
+                type_distinct.setdefault(ResolutionMemo.key(e_type, name,
+                                                            self.case_sensitive), name)
+        if self.method == LOOKUP_AUTO:
+            self._pick_methods(distinct)
+        bulk_types = []
+        searches = []
+        for e_type, type_distinct in distinct.items():
+            method = self.type_method(e_type)
+            if method == LOOKUP_BULK:
+                bulk_types.append(e_type)
+            elif method == LOOKUP_REGEX:
+                searches.extend((e_type, chunk) for chunk in
+                                _name_patterns(type_distinct.values(),
+                                               REGEX_LOOKUP_LENGTH))
+        if bulk_types:
+            self.prefetch(bulk_types)
+        _map_concurrent(lambda search: self._search_patterns(*search), searches,
+                        workers=workers)
+
+    def resolve(self, entity_type, name):
+        """Matches a single display name to a uuid.
+
+        Returns:
+            str: uuid of the matching entity
+
+        Raises:
+            NameMatchError: If an entity can't be found by name
+            MultipleMatchingNamesError: If multiple entities match a name
+        """
+        method = self.type_method(entity_type)
+        if method == LOOKUP_BULK:
+            # The local index answers as fast as the memo would
+            self.prefetch([entity_type])
+            return self.index.lookup_unique(entity_type, name,
+                                            case_sensitive=self.case_sensitive,
+                                            active_only=self.active_only)
+        uuids = self.memo.get(entity_type, name,
+                              case_sensitive=self.case_sensitive,
+                              active_only=self.active_only)
+        if uuids is None:
+            if method == LOOKUP_REGEX:
+                uuids = self._search_patterns(entity_type,
+                                              _name_patterns([name],
+                                                             REGEX_LOOKUP_LENGTH)[0])[name]
+                return _unique_uuid(entity_type, name, uuids,
+                                    active_only=self.active_only)
+            index = EntityIndex(self._conn.search_by_name(name, type=entity_type,
+                                                          case_sensitive=self.case_sensitive,
+                                                          fetch_all=True))
+            uuids = index.match_uuids(entity_type, name,
+                                      case_sensitive=self.case_sensitive,
+                                      active_only=self.active_only)
+            self.memo.set(entity_type, name, uuids,
+                          case_sensitive=self.case_sensitive,
+                          active_only=self.active_only)
+        return _unique_uuid(entity_type, name, uuids, active_only=self.active_only)
+
+class SyncCache(object):
+    """Local SQLite cache of entity uuids for a Turbonomic target.
+
+    Entity names are cached per entity type. Each listing expires ttl seconds
+    after it was fetched. Groups are always listed from the server.
+
+    Member digests of synced groups are also kept, so unchanged groups can
+    be skipped without fetching their members, and fingerprints of the csv
+    groups of the last sync, so unchanged csv groups can be skipped entirely.
+
+    Args:
+        path (str): Path to the SQLite cache file, created if missing.
+        target (str): Turbonomic server address the cached uuids belong to.
+        ttl (int, optional): Seconds before a cached listing expires.
+    """
+    def __init__(self, path, target, ttl=CACHE_TTL):
+        self.path = path
+        self.target = target
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # Deferred, only runs with a cache need sqlite3
+        import sqlite3
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            if version != CACHE_VERSION:
+                # Cached data is disposable, rebuild with the current schema
+                for table in ["listings", "entries", "digests", "fingerprints"]:
+                    self._db.execute("DROP TABLE IF EXISTS {}".format(table))
+                self._db.execute("PRAGMA user_version = {}".format(CACHE_VERSION))
+            self._db.execute("CREATE TABLE IF NOT EXISTS listings"
+                             " (target TEXT, listing TEXT, fetched REAL,"
+                             " PRIMARY KEY (target, listing))")
+            self._db.execute("CREATE TABLE IF NOT EXISTS entries"
+                             " (target TEXT, listing TEXT, name TEXT,"
+                             " uuid TEXT, state TEXT)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS entries_key"
+                             " ON entries (target, listing, name)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS digests"
+                             " (target TEXT, uuid TEXT, digest TEXT,"
+                             " size INTEGER, PRIMARY KEY (target, uuid))")
+            self._db.execute("CREATE TABLE IF NOT EXISTS fingerprints"
+                             " (target TEXT, name TEXT, entity_type TEXT,"
+                             " fingerprint TEXT,"
+                             " PRIMARY KEY (target, name, entity_type))")
+
+    @staticmethod
+    def _entity_listing(entity_type):
+        return "entities:{}".format(entity_type)
+
+    def _get_listing(self, listing):
+        """Returns (name, uuid, state) rows or None if missing or expired"""
+        with self._lock:
+            row = self._db.execute("SELECT fetched FROM listings WHERE target=?"
+                                   " AND listing=?",
+                                   (self.target, listing)).fetchone()
+            if row is None or time.time() - row[0] > self.ttl:
+                return None
+            return self._db.execute("SELECT name, uuid, state FROM entries"
+                                    " WHERE target=? AND listing=?",
+                                    (self.target, listing)).fetchall()
+
+    def _set_listing(self, listing, rows):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM entries WHERE target=? AND listing=?",
+                             (self.target, listing))
+            self._db.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?)",
+                                 ((self.target, listing) + tuple(row)
+                                  for row in rows))
+            self._db.execute("INSERT OR REPLACE INTO listings VALUES (?, ?, ?)",
+                             (self.target, listing, time.time()))
+
+    def has_entities(self, entity_type):
+        """Returns True if entities of entity_type are cached and not expired"""
+        with self._lock:
+            row = self._db.execute("SELECT fetched FROM listings WHERE target=?"
+                                   " AND listing=?",
+                                   (self.target,
+                                    self._entity_listing(entity_type))).fetchone()
+        return row is not None and time.time() - row[0] <= self.ttl
+
+    def get_entities(self, entity_type):
+        """Get cached entities of entity_type.
+
+        Returns:
+            List of entity dictionaries accepted by EntityIndex.add or None
+            if the entity type is not cached or expired.
+        """
+        rows = self._get_listing(self._entity_listing(entity_type))
+        if rows is None:
+            return None
+        return [{"uuid": uuid, "displayName": name, "className": entity_type,
+                 "state": state} for name, uuid, state in rows]
+
+    def set_entities(self, entity_type, records):
+        """Replaces the cached entities of entity_type.
+
+        Args:
+            entity_type (str): Type of entities.
+            records (iterable): EntityRecord of every entity of entity_type.
+        """
+        self._set_listing(self._entity_listing(entity_type),
+                          ((r.name, r.uuid, r.state) for r in records))
+
+    def get_digest(self, uuid):
+        """Get the member digest recorded for a group.
+
+        Returns:
+            Tuple of (digest, member count) or None if not recorded.
+        """
+        with self._lock:
+            return self._db.execute("SELECT digest, size FROM digests WHERE"
+                                    " target=? AND uuid=?",
+                                    (self.target, uuid)).fetchone()
+
+    def set_digest(self, uuid, digest, size):
+        """Records the member digest of a synced group.
+
+        Args:
+            uuid (str): Group uuid.
+            digest (str): Digest of the desired members, see _member_digest.
+            size (int): Member count of the group after the sync.
+        """
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?)",
+                             (self.target, uuid, digest, size))
+
+    def get_fingerprints(self):
+        """Get the csv group fingerprints of the last sync.
+
+        Returns:
+            Dictionary of {(name, entity_type): fingerprint}.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT name, entity_type, fingerprint FROM"
+                                    " fingerprints WHERE target=?",
+                                    (self.target,)).fetchall()
+        return {(name, e_type): fingerprint for name, e_type, fingerprint in rows}
+
+    def set_fingerprints(self, fingerprints):
+        """Replaces the csv group fingerprints of the target.
+
+        Args:
+            fingerprints (dict): Dictionary of {(name, entity_type):
+                fingerprint}, see _group_fingerprint.
+        """
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM fingerprints WHERE target=?",
+                             (self.target,))
+            self._db.executemany("INSERT INTO fingerprints VALUES (?, ?, ?, ?)",
+                                 ((self.target, name, e_type, fingerprint)
+                                  for (name, e_type), fingerprint
+                                  in fingerprints.items()))
+
+    def invalidate(self, entity_type=None):
+        """Removes cached listings of the target.
+
+        With no arguments every listing, digest and fingerprint of the target
+        is removed.
+
+        Args:
+            entity_type (str, optional): Entity type listing to remove.
+        """
+        listings = []
+        if entity_type is not None:
+            listings.append(self._entity_listing(entity_type))
+        with self._lock, self._db:
+            if not listings:
+                for table in ["entries", "listings", "digests", "fingerprints"]:
+                    self._db.execute("DELETE FROM {} WHERE"
+                                     " target=?".format(table), (self.target,))
+            for listing in listings:
+                self._db.execute("DELETE FROM entries WHERE target=? AND"
+                                 " listing=?", (self.target, listing))
+                self._db.execute("DELETE FROM listings WHERE target=? AND"
+                                 " listing=?", (self.target, listing))
+
+    def close(self):
+        self._db.close()
+
+class SyncJournal(object):
+    """Append-only journal of a main() run, used to resume it if it stops.
+
+    Each line is a JSON record: the run id, the resolved groups with the
+    events tracked while resolving them, and each group once it is synced.
+    Records are flushed as they are written, so a run that dies keeps every
+    group synced before it stopped.
+
+    Args:
+        path (str): Path to the journal file.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._lock = threading.Lock()
+
+    def load(self, run_id):
+        """Reads the state of an unfinished run.
+
+        Args:
+            run_id (str): Id of the run to resume.
+
+        Returns:
+            None if the journal is missing, belongs to another run or the run
+            completed. Otherwise a dictionary of the resolved groups, the
+            change dictionary tracked while resolving them and the events of
+            each synced group::
+
+            {
+             "groups": [] or None,
+             "changes": {},
+             "synced": {("name", "entity_type"): [["category", "group name",
+                                                   "message"]]}
+            }
+        """
+        try:
+            journal = open(self.path)
+        except FileNotFoundError:
+            return None
+        state = None
+        with journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Records cut short by a failure are skipped
+                    continue
+                kind = record.get("record")
+                if kind == "run":
+                    if record["id"] != run_id or record["version"] != JOURNAL_VERSION:
+                        return None
+                    state = {"groups": None, "changes": {}, "synced": {}}
+                elif state is None or kind == "complete":
+                    return None
+                elif kind == "groups":
+                    state["groups"] = record["groups"]
+                    state["changes"] = record["changes"]
+                elif kind == "group":
+                    state["synced"][(record["name"], record["entity_type"])] = record["events"]
+        return state
+
+    def start(self, run_id, resume=False):
+        """Opens the journal for writing.
+
+        Args:
+            run_id (str): Id of the run.
+            resume (bool, optional): If True, records are appended to the
+                journal of the run. Otherwise the journal is replaced.
+        """
+        if resume:
+            with open(self.path, "rb") as journal:
+                journal.seek(0, 2)
+                cut_short = False
+                if journal.tell():
+                    journal.seek(-1, 2)
+                    cut_short = journal.read(1) != b"\n"
+            self._file = open(self.path, "a")
+            if cut_short:
+                # End the record cut short by the failure
+                self._file.write("\n")
+            return
+        self._file = open(self.path, "w")
+        self._write({"record": "run", "id": run_id, "version": JOURNAL_VERSION,
+                     "started": time.time()})
+
+    def _write(self, record):
+        with self._lock:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+
+    def resolved(self, groups, changes):
+        """Records the groups with member uuids and the change dictionary
+        tracked while resolving them."""
+        self._write({"record": "groups",
+                     "groups": [{"name": g["name"],
+                                 "entity_type": g["entity_type"],
+                                 "members": g["members"]} for g in groups],
+                     "changes": changes})
+
+    def synced(self, group, events):
+        """Records a group that was synced and its (category, event) events"""
+        self._write({"record": "group", "name": group["name"],
+                     "entity_type": group["entity_type"],
+                     "events": [[category, event[0], event[1]]
+                                for category, event in events]})
+
+    def complete(self):
+        """Records that the run finished, it can no longer be resumed"""
+        self._write({"record": "complete", "finished": time.time()})
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+class CommitQueue(object):
+    """Ordered queue of group adds, updates and deletes committed in batches.
+
+    Changes are committed in the order they were first queued. Deletes of
+    the same uuid are coalesced into one request. Adds and updates are
+    planned from the desired members of the whole group, so a group can
+    only have one add or update queued, see main for merging groups listed
+    more than once.
+
+    Args:
+        conn (VMTConnection): VMTConnection instance to target Turbonomic Server.
+        batch_size (int, optional): Number of changes committed before
+            waiting for the batch to finish. If 0, all changes are one batch.
+        rate_limit (float, optional): Maximum changes committed per second.
+            If 0, changes are not rate limited.
+        workers (int, optional): Number of changes committed concurrently
+            within a batch.
+        dryrun (bool, optional): If True, changes are not committed to the
+            target Turbonomic server.
+        run_async (bool, optional): If True, concurrent changes are committed
+            as asyncio coroutines.
+        registry (GroupRegistry, optional): Registry used to check if added
+            groups already exist.
+    """
+    def __init__(self, conn, batch_size=COMMIT_BATCH_SIZE, rate_limit=COMMIT_RATE,
+                 workers=1, dryrun=False, run_async=False, registry=None):
+        self.conn = conn
+        self.registry = registry
+        self.batch_size = batch_size
+        self.rate_limit = rate_limit
+        self.workers = workers
+        self.dryrun = dryrun
+        self.run_async = run_async
+        self._entries = {}
+        self._order = []
+        self._lock = threading.Lock()
+        self._next_commit = 0
+
+    def __len__(self):
+        return len(self._order)
+
+    def put(self, action, group, plan=None):
+        """Queues a change for a parsed group.
+
+        Args:
+            action (str): COMMIT_ADD, COMMIT_UPDATE or COMMIT_DELETE.
+            group (dict): Group with "name", "entity_type", "uuid" and
+                "members" uuids. Adds use the members, updates and deletes
+                require the uuid.
+            plan (dict, optional): Output of StaticGroup.plan() for updates.
+
+        Raises:
+            CommitConflictError: If an add or update is already queued for
+                the group, or a different change is queued for its uuid.
+        """
+        key = group["uuid"]
+        if action == COMMIT_ADD:
+            key = (COMMIT_ADD, group["name"])
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = {"action": action,
+                     "name": group["name"],
+                     "entity_type": group["entity_type"],
+                     "uuid": group["uuid"],
+                     "members": None,
+                     "plan": plan,
+                     "groups": [group]}
+            if action == COMMIT_ADD:
+                entry["members"] = list(group["members"])
+            self._entries[key] = entry
+            self._order.append(entry)
+            return
+        if action != COMMIT_DELETE or entry["action"] != action:
+            raise CommitConflictError("Cannot {} '{}', a {} is already"
+                                      " queued".format(action, group["name"],
+                                                       entry["action"]))
+        entry["groups"].append(group)
+
+    def _wait(self):
+        # Space commits 1/rate_limit seconds apart across workers
+        if not self.rate_limit:
+            return
+        with self._lock:
+            now = time.time()
+            start = max(now, self._next_commit)
+            self._next_commit = start + 1.0 / self.rate_limit
+        if start > now:
+            time.sleep(start - now)
+
+    def _commit(self, entry):
+        self._wait()
+        group_instance = StaticGroup(self.conn, entry["name"], entry["entity_type"],
+                                     entry["members"] or [], uuid=entry["uuid"],
+                                     registry=self.registry)
+        try:
+            if entry["action"] == COMMIT_ADD:
+                response = group_instance.add(dryrun=self.dryrun)
+            elif entry["action"] == COMMIT_UPDATE:
+                response = group_instance.update(dryrun=self.dryrun,
+                                                 plan=entry["plan"])
+            else:
+                response = group_instance.remove(dryrun=self.dryrun)
+            return entry, response, None
+        except Exception as e:
+            return entry, None, e
+
+    def dispatch(self):
+        """Commits and removes every queued change.
+
+        Yields:
+            Tuple of the queued change, the vmtconnect response and the
+            exception raised or None for every change in queue order, as
+            soon as it is committed. The change is a dictionary with the
+            "action", "name", "entity_type", "uuid", committed "members" or
+            "plan" and the parsed "groups" it was coalesced from.
+        """
+        entries = self._order
+        self._entries = {}
+        self._order = []
+        batch_size = self.batch_size or len(entries) or 1
+        for start in range(0, len(entries), batch_size):
+            batch = entries[start:start + batch_size]
+            if self.run_async:
+                results = _map_concurrent(self._commit, batch,
+                                          workers=self.workers, run_async=True)
+                for result in results:
+                    yield result
+            elif self.workers > 1:
+                from concurrent.futures import ThreadPoolExecutor
+                with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                    for result in executor.map(self._commit, batch):
+                        yield result
+            else:
+                for entry in batch:
+                    yield self._commit(entry)
+
+class AsyncRunner(object):
+    """Runs blocking vmtconnect calls as coroutines with a concurrency cap.
+
+    Calls are executed on a bounded thread pool, so concurrent coroutines
+    share the keep-alive connection pool of a single vmtconnect session.
+    The thread pool is shut down by close(), or when used as a context
+    manager.
+
+    Args:
+        concurrency (int, optional): Maximum number of concurrent calls.
+    """
+    def __init__(self, concurrency=ASYNC_CONCURRENCY):
+        from concurrent.futures import ThreadPoolExecutor
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max(concurrency, 1))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def run(self, func, *args, **kwargs):
+        """Awaits func(*args, **kwargs) on the runner's thread pool."""
+        import asyncio
+        # get_running_loop is only available from Python 3.7
+        get_loop = getattr(asyncio, "get_running_loop", asyncio.get_event_loop)
+        return await get_loop().run_in_executor(self._executor,
+                                                partial(func, *args, **kwargs))
+
+    def close(self):
+        """Waits for running calls and shuts down the thread pool."""
+        self._executor.shutdown(wait=True)
+
+class AsyncGroupUpdateUtility(object):
+    """asyncio twin of GroupUpdateUtility.
+
+    A runner created by the instance is shut down by close(), or when the
+    instance is used as a context manager. The connection pool of the
+    vmtconnect session is sized for the runner's concurrency.
+
+    Args:
+        conn (VMTConnection): VMTConnection instance to target Turbonomic Server.
+        runner (AsyncRunner, optional): Runner shared with other async
+            objects to cap concurrent requests. Not closed by close().
+    """
+    def __init__(self, conn, runner=None):
+        self._owns_runner = runner is None
+        self.runner = runner or AsyncRunner()
+        self.utils = GroupUpdateUtility(conn)
+        _size_connection_pool(conn, self.runner.concurrency)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shuts down the runner if it was created by this instance."""
+        if self._owns_runner:
+            self.runner.close()
+
+    async def get_group_index(self, *args, **kwargs):
+        """See GroupUpdateUtility.get_group_index"""
+        return await self.runner.run(self.utils.get_group_index, *args, **kwargs)
+
+    async def get_entity_index(self, *args, **kwargs):
+        """See GroupUpdateUtility.get_entity_index"""
+        return await self.runner.run(self.utils.get_entity_index, *args, **kwargs)
+
+    async def get_group_diff(self, *args, **kwargs):
+        """See GroupUpdateUtility.get_group_diff"""
+        return await self.runner.run(self.utils.get_group_diff, *args, **kwargs)
+
+class AsyncStaticGroup(object):
+    """asyncio twin of StaticGroup.
+
+    Every StaticGroup method is available as a coroutine. Attributes such as
+    name, members and uuid are read from and written to the wrapped
+    StaticGroup, available as self.group. A runner created by the instance
+    is shut down by close(), or when the instance is used as a context
+    manager. The connection pool of the vmtconnect session is sized for the
+    runner's concurrency.
+
+    Args:
+        conn (VMTConnection): VMTConnection instance to target Turbonomic Server.
+        name (str): Name of Static Group.
+        entity_type (str): Type of entities in group
+        members (list, optional): List of desired member uuids/names
+        uuid (str, optional): UUID of group if already exists.
+        entity_index (EntityIndex, optional): Index used to match member names
+            to uuids.
+        registry (GroupRegistry, optional): Registry used to check if the
+            group exists.
+        memo (ResolutionMemo, optional): Memo of names already matched.
+        runner (AsyncRunner, optional): Runner shared with other async
+            objects to cap concurrent requests. Not closed by close().
+    """
+    def __init__(self, conn, name, entity_type, members=[], uuid=None,
+                 entity_index=None, registry=None, memo=None, runner=None):
+        self.__dict__["_owns_runner"] = runner is None
+        self.__dict__["runner"] = runner or AsyncRunner()
+        self.__dict__["group"] = StaticGroup(conn, name, entity_type,
+                                             members=members, uuid=uuid,
+                                             entity_index=entity_index,
+                                             registry=registry, memo=memo)
+        _size_connection_pool(conn, self.runner.concurrency)
+
+    def __getattr__(self, attr):
+        return getattr(self.group, attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self.group, attr, value)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Shuts down the runner if it was created by this instance."""
+        if self._owns_runner:
+            self.runner.close()
+
+    async def add(self, **kwargs):
+        """See StaticGroup.add"""
+        return await self.runner.run(self.group.add, **kwargs)
+
+    async def update(self, **kwargs):
+        """See StaticGroup.update"""
+        return await self.runner.run(self.group.update, **kwargs)
+
+    async def resolve_names(self, names, **kwargs):
+        """See StaticGroup.resolve_names"""
+        return await self.runner.run(self.group.resolve_names, names, **kwargs)
+
+    async def plan(self, **kwargs):
+        """See StaticGroup.plan"""
+        return await self.runner.run(self.group.plan, **kwargs)
+
+    async def add_or_update(self, **kwargs):
+        """See StaticGroup.add_or_update"""
+        return await self.runner.run(self.group.add_or_update, **kwargs)
+
+    async def remove(self, **kwargs):
+        """See StaticGroup.remove"""
+        return await self.runner.run(self.group.remove, **kwargs)
+
+    async def add_entities(self, members, **kwargs):
+        """See StaticGroup.add_entities"""
+        return await self.runner.run(self.group.add_entities, members, **kwargs)
+
+    async def remove_entities(self, members, **kwargs):
+        """See StaticGroup.remove_entities"""
+        return await self.runner.run(self.group.remove_entities, members, **kwargs)
+
+    async def get_current_members(self):
+        """See StaticGroup.get_current_members"""
+        return await self.runner.run(self.group.get_current_members)
+
+    async def exists(self):
+        """See StaticGroup.exists"""
+        return await self.runner.run(self.group.exists)
+
+## ----------------------------------------------------
+##   Internal Utility Classes and Functions
+## ----------------------------------------------------
+
+# Logging
+class _EventTracker(object):
+    """Utility Object to store and log events by categories
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self.__changes = {}
+
+    def __add_change_object(self, category):
+        if category not in self.__changes.keys():
+            self.__changes[category] = {"total":0,"events":[]}
+
+    def track(self, category, event=(), msg=True, **kwargs):
+        self.__add_change_object(category)
+        self.__changes[category]["total"] += 1
+        if event:
+            # TODO If expanding dictionary, move tuple conversion
+            # to static method
+            self.__changes[category]["events"].append({"group name":event[0],
+                                                       "message": event[1]})
+            if msg:
+                _msg(event[1], **kwargs)
+
+    def to_dict(self):
+        return self.__changes
+
+def _msg(msg, end='\n', logger=None, level=None, exc_info=False, warn=False,
+         error=False):
+    """Message handler"""
+    global LOGGER, QUIET, TRACE, WARN
+
+    empty_trace = (None, None, None)
+
+    if logger is None:
+        logger = LOGGER
+
+    if TRACE and sys.exc_info() != empty_trace:
+        exc_info = True
+
+    if warn:
+        level = "warn"
+
+    if logger:
+        if level == 'critical':
+            logger.critical(msg, exc_info=exc_info)
+        elif level == 'error':
+            logger.error(msg, exc_info=exc_info)
+        elif level == 'warn' or level == 'warning':
+            logger.warning(msg, exc_info=exc_info)
+        elif level == 'debug':
+            logger.debug(msg, exc_info=exc_info)
+        else:
+            logger.info(msg, exc_info=exc_info)
+
+    if not QUIET or error:
+        if warn and not WARN:
+            pass
+        else:
+            if warn:
+                msg = "Warning: {}".format(msg)
+            print(msg, end=end)
+
+def _log_summary(change_dict, dryrun, ignore_total=[]):
+    summary_bar = "="*15
+    title = "    Summary    "
+    dryrun_status = ""
+    if dryrun:
+        dryrun_status = "-dryrun enabled"
+    operations = []
+    total = 0
+    for category, attr in change_dict.items():
+        if category in [RUN_METRICS, RUN_TARGETS]:
+            continue
+        operations.append("{}: {}".format(category, attr["total"]))
+        if category not in ignore_total:
+            total += attr["total"]
+    operations = "\n".join(operations)
+    summary_str = "\n".join(["",summary_bar, title, summary_bar, dryrun_status,
+                            operations, summary_bar])
+    if RUN_METRICS in change_dict:
+        summary_str = "\n".join([summary_str, "    Metrics    ", summary_bar,
+                                 _format_metrics(change_dict[RUN_METRICS]),
+                                 summary_bar])
+    if RUN_TARGETS in change_dict:
+        summary_str = "\n".join([summary_str, "    Targets    ", summary_bar,
+                                 _format_targets(change_dict[RUN_TARGETS]),
+                                 summary_bar])
+    _msg(summary_str, level="info")
+
+def _format_metrics(metrics):
+    lines = []
+    for phase, attr in metrics["phases"].items():
+        calls = ", ".join("{}={}".format(k, v)
+                          for k, v in sorted(attr["api_calls"].items()))
+        lines.append("{}: {:.3f}s{}".format(phase, attr["wall_time"],
+                                           " ({})".format(calls) if calls else ""))
+    if metrics["api_latency"]:
+        lines.append("API latency ms ({}):".format(
+            "/".join("p{}".format(p) for p in LATENCY_PERCENTILES)))
+    for method, attr in sorted(metrics["api_latency"].items()):
+        lines.append("  {}: {} ({} calls)".format(
+            method,
+            "/".join("{:.1f}".format(attr["p{}".format(p)] * 1000)
+                     for p in LATENCY_PERCENTILES),
+            attr["calls"]))
+    if "name_lookups" in metrics:
+        lines.append("Name lookups: {hits} memo hits, {misses} misses".format(
+            **metrics["name_lookups"]))
+    lines.append("Total: {:.3f}s".format(metrics["wall_time"]))
+    return "\n".join(lines)
+
+def _format_targets(target_runs):
+    lines = []
+    for target, attr in sorted(target_runs.items()):
+        if attr["error"] is not None:
+            lines.append("{}: failed, {}".format(target, attr["error"]))
+        else:
+            lines.append("{}: {:.3f}s".format(target,
+                                              attr[RUN_METRICS]["wall_time"]))
+    return "\n".join(lines)
+
+# Metrics
+class _RunMetrics(object):
+    """Records time and api calls per phase and latency per api method.
+
+    The current phase is kept per thread, so api calls made by concurrent
+    workers are counted against the phase each worker is in.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start = time.time()
+        self._phases = {}
+        self._latencies = {}
+        self._errors = Counter()
+
+    def _phase(self, name):
+        if name not in self._phases:
+            self._phases[name] = {"start": None, "end": None, "busy_time": 0.0,
+                                  "api_calls": Counter()}
+        return self._phases[name]
+
+    @contextmanager
+    def phase(self, name):
+        """Counts time and api calls inside the with block against name"""
+        previous = getattr(self._local, "phase", None)
+        self._local.phase = name
+        start = time.time()
+        try:
+            yield
+        finally:
+            end = time.time()
+            self._local.phase = previous
+            with self._lock:
+                phase = self._phase(name)
+                if phase["start"] is None or start < phase["start"]:
+                    phase["start"] = start
+                if phase["end"] is None or end > phase["end"]:
+                    phase["end"] = end
+                phase["busy_time"] += end - start
+
+    def record_call(self, method, seconds, phase=None, error=False):
+        """Records a single api request"""
+        name = phase or getattr(self._local, "phase", None) or PHASE_OTHER
+        with self._lock:
+            self._phase(name)["api_calls"][method] += 1
+            self._latencies.setdefault(method, []).append(seconds)
+            if error:
+                self._errors[method] += 1
+
+    @staticmethod
+    def _percentile(values, percentile):
+        # Nearest-rank percentile of sorted values
+        rank = max(int(-(-percentile * len(values) // 100)), 1)
+        return values[rank - 1]
+
+    def to_dict(self):
+        with self._lock:
+            phases = {}
+            for name, phase in self._phases.items():
+                wall_time = 0.0
+                if phase["start"] is not None:
+                    wall_time = phase["end"] - phase["start"]
+                phases[name] = {"wall_time": round(wall_time, 4),
+                                "busy_time": round(phase["busy_time"], 4),
+                                "api_calls": dict(phase["api_calls"])}
+            api_latency = {}
+            for method, latencies in self._latencies.items():
+                latencies = sorted(latencies)
+                api_latency[method] = {"calls": len(latencies),
+                                       "errors": self._errors[method],
+                                       "max": round(latencies[-1], 4)}
+                for p in LATENCY_PERCENTILES:
+                    api_latency[method]["p{}".format(p)] = round(
+                        self._percentile(latencies, p), 4)
+        return {"wall_time": round(time.time() - self._start, 4),
+                "phases": phases, "api_latency": api_latency}
+
+# Connection
+class _ThrottledConnection(object):
+    """Connection wrapper that retries calls rejected by a busy server.
+
+    Reads that fail with HTTP 429 or 503 are retried up to RETRY_LIMIT times,
+    waiting RETRY_BACKOFF seconds doubled on every attempt. Other calls may
+    have changed the server before failing and are not retried, except
+    add_static_group, which is retried only if no group with the exact name
+    was created. If metrics is a _RunMetrics instance, every attempt is
+    recorded with its latency, against phase if given or the current phase
+    of the calling thread.
+    """
+    def __init__(self, conn, metrics=None, phase=None):
+        self._conn = conn
+        self._metrics = metrics
+        self._phase = phase
+
+    def __getattr__(self, attr):
+        value = getattr(self._conn, attr)
+        if not callable(value):
+            return value
+
+        @wraps(value)
+        def retry(*args, **kwargs):
+            attempt = 0
+            while True:
+                start = time.time()
+                try:
+                    response = value(*args, **kwargs)
+                    if self._metrics is not None:
+                        self._metrics.record_call(attr, time.time() - start,
+                                                  phase=self._phase)
+                    return response
+                except Exception as e:
+                    if self._metrics is not None:
+                        self._metrics.record_call(attr, time.time() - start,
+                                                  phase=self._phase, error=True)
+                    if (attempt >= RETRY_LIMIT or not _is_throttled(e)
+                            or not (_is_read(attr, args, kwargs)
+                                    or attr == "add_static_group")):
+                        raise
+                    delay = RETRY_BACKOFF * 2 ** attempt
+                    attempt += 1
+                    _msg("Server busy, retrying {} in {}s".format(attr, delay),
+                         level="debug")
+                    time.sleep(delay)
+                    if attr == "add_static_group":
+                        # The server may have created the group before failing
+                        groups = self._added_groups(*args, **kwargs)
+                        if groups:
+                            return groups
+        return retry
+
+    def _added_groups(self, name, type=None, members=None):
+        return _groups_named(self, name)
+
+def _is_read(attr, args, kwargs):
+    """Checks if a vmtconnect call only reads from the server"""
+    if attr == "request":
+        method = args[1] if len(args) > 1 else kwargs.get("method", "GET")
+        return method.upper() == "GET" and kwargs.get("dto") is None
+    return attr.startswith("get_") or attr.startswith("search")
+
+def _vmtconnect():
+    """The vmtconnect module, None if it is not installed"""
+    try:
+        import vmtconnect
+    except ImportError:
+        return None
+    return vmtconnect
+
+def _is_not_found(error):
+    """Checks if an exception is a vmtconnect HTTP 404 error"""
+    vmtconnect = _vmtconnect()
+    return vmtconnect is not None and isinstance(error, vmtconnect.HTTP404Error)
+
+def _is_throttled(error):
+    """Checks if an exception is a vmtconnect HTTP 429 or 503 error"""
+    vmtconnect = _vmtconnect()
+    if vmtconnect is None:
+        return False
+    # vmtconnect raises 429 responses as generic client errors
+    return (isinstance(error, vmtconnect.HTTP503Error)
+            or (isinstance(error, vmtconnect.HTTP400Error)
+                and str(error).startswith("HTTP 429")))
+
+def _response_uuid(response):
+    """Get the uuid from a vmtconnect response of a single object"""
+    if isinstance(response, list) and len(response) == 1:
+        response = response[0]
+    if isinstance(response, dict):
+        return response.get("uuid")
+    return None
+
+# Concurrency
+def _map_concurrent(func, items, workers=1, run_async=False):
+    """Calls func for every item and returns the results in item order.
+
+    Args:
+        func (function): Function of a single item.
+        items (iterable): Items to call func with.
+        workers (int, optional): Maximum number of concurrent calls.
+        run_async (bool, optional): If True, calls are run as coroutines on
+            an asyncio event loop.
+
+    Returns:
+        List of results in the order of items.
+    """
+    items = list(items)
+    if run_async:
+        # Deferred, asyncio is slow to import and only needed for run_async
+        import asyncio
+        runner = AsyncRunner(workers)
+
+        async def run_all():
+            return await asyncio.gather(*[runner.run(func, i) for i in items])
+
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(run_all())
+        finally:
+            loop.close()
+            runner.close()
+    if workers > 1 and len(items) > 1:
+        # Deferred, serial runs need no thread pool
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(func, items))
+    return [func(i) for i in items]
+
+def _iter_concurrent(func, items, workers=1):
+    """Calls func for every item and yields results in item order.
+
+    At most twice workers calls are submitted ahead of the result being
+    yielded, so finished results are not all held in memory.
+
+    Args:
+        func (function): Function of a single item.
+        items (iterable): Items to call func with.
+        workers (int, optional): Maximum number of concurrent calls.
+
+    Yields:
+        Results in the order of items.
+    """
+    if workers <= 1:
+        for i in items:
+            yield func(i)
+        return
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = deque()
+        for i in items:
+            futures.append(executor.submit(func, i))
+            if len(futures) >= workers * 2:
+                yield futures.popleft().result()
+        while futures:
+            yield futures.popleft().result()
+
+def _requests_session(conn):
+    """The requests session of a vmtconnect connection, None if it has none"""
+    try:
+        import requests
+    except ImportError:
+        return None
+    # Connection.session is only a flag, vmtconnect keeps the session private
+    for attr in ["_Connection__session", "session"]:
+        session = getattr(conn, attr, None)
+        if isinstance(session, requests.Session):
+            return session
+    return None
+
+def _size_connection_pool(conn, size):
+    """Lets the vmtconnect requests session keep size connections alive"""
+    if size <= HTTP_POOL_SIZE:
+        return
+    session = _requests_session(conn)
+    if session is None:
+        return
+    import requests
+    for prefix in ["https://", "http://"]:
+        current = session.get_adapter(prefix)
+        # Mounting an adapter drops the connections pooled by the current one
+        if getattr(current, "_pool_maxsize", 0) >= size:
+            continue
+        session.mount(prefix, requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=size,
+            max_retries=getattr(current, "max_retries", 0)))
+
+# CSV Parsing
+def _open_csv(csv_file):
+    """Opens a csv path, compressed csv path or STDIN_CSV as a binary stream"""
+    if csv_file == STDIN_CSV:
+        # Leave stdin open for the caller
+        return open(sys.stdin.fileno(), "rb", closefd=False)
+    module = CSV_OPENERS.get(os.path.splitext(csv_file)[1].lower())
+    if module is None:
+        return open(csv_file, "rb")
+    # Compression modules are only imported for compressed csv files
+    return importlib.import_module(module).open(csv_file, "rb")
+
+def _count_quotes(data, start, end):
+    """Number of double quotes in data[start:end], read in chunks"""
+    quotes = 0
+    chunk_size = 1024 * 1024
+    for offset in range(start, end, chunk_size):
+        quotes += data[offset:min(offset + chunk_size, end)].count(b'"')
+    return quotes
+
+def _csv_record_end(data, start, quotes=0):
+    """Returns the offset after the first record ending at or after start.
+
+    A newline only ends a record after an even number of double quotes since
+    the last record boundary, as quotes inside quoted fields are doubled.
+    quotes is the number of double quotes between that boundary and start.
+    """
+    pos = start
+    while True:
+        newline = data.find(b"\n", pos)
+        if newline == -1:
+            return len(data)
+        quotes += _count_quotes(data, pos, newline)
+        if quotes % 2 == 0:
+            return newline + 1
+        pos = newline + 1
+
+def _csv_ranges(data, start, count):
+    """Splits data after start into up to count (start, end) byte ranges of
+    whole csv records"""
+    ranges = []
+    boundary = start
+    for i in range(1, count):
+        target = start + (len(data) - start) * i // count
+        if target <= boundary:
+            continue
+        end = _csv_record_end(data, target, _count_quotes(data, boundary, target))
+        ranges.append((boundary, end))
+        boundary = end
+    if boundary < len(data):
+        ranges.append((boundary, len(data)))
+    return ranges
+
+def _group_csv_range(csv_file, start, end, columns, group_prefix="",
+                     group_delimiter="_"):
+    """Groups the csv records in a byte range, run in a worker process.
+
+    Returns:
+        Dictionary as returned by CSVGroupParser._group_values_by_key.
+    """
+    with open(csv_file, "rb") as csv_in:
+        csv_in.seek(start)
+        text = csv_in.read(end - start).decode("utf-8")
+    rows = csv.reader(io.StringIO(text, newline=""))
+    return CSVGroupParser._group_values_by_key(rows, *columns,
+                                               group_prefix=group_prefix,
+                                               group_delimiter=group_delimiter)
+
+# Config Parsing
+def _config_to_args(config, args_dict, ignore=[]):
+    config_dict = json.load(open(config))
+    for i in ignore:
+        if i in config_dict.keys():
+            config_dict.pop(i)
+    args_dict.update(config_dict)
+    return args_dict
+
+def _parse_targets(args_dict):
+    """Returns (target, encoded_creds) pairs from the target and targets args.
+
+    targets may only be set by a config file, as a list of addresses or of
+    {"target": str, "encoded_creds": str} objects. Targets without their
+    own credentials use the shared credentials, and encoded_creds is None.
+    """
+    targets = args_dict.get("targets") or args_dict["target"]
+    if not isinstance(targets, list):
+        targets = [targets]
+    parsed = []
+    for target in targets:
+        if isinstance(target, dict):
+            parsed.append((target["target"], target.get("encoded_creds")))
+        else:
+            parsed.append((target, None))
+    return parsed
+
+def _group_fingerprint(group, **options):
+    """Digest of a parsed group's name, type, member names and sync options"""
+    import hashlib
+    digest = hashlib.sha1(json.dumps([group["name"], group["entity_type"], options],
+                                     sort_keys=True).encode())
+    for name in sorted(set(group["members"])):
+        digest.update(b"\n")
+        digest.update(name.encode())
+    return digest.hexdigest()
+
+def _name_list(names, limit=10):
+    """Comma separated names, shortened after limit names"""
+    names = list(names)
+    if len(names) > limit:
+        return "{} and {} more".format(", ".join(names[:limit]),
+                                       len(names) - limit)
+    return ", ".join(names)
+
+def _name_patterns(names, max_length):
+    """Anchored regular expressions matching names, each up to max_length
+    characters unless a single name is longer.
+
+    Returns:
+        List of (pattern, names) tuples with the names each pattern matches.
+    """
+    patterns = []
+    chunk = []
+    length = 0
+    for name in sorted(names):
+        escaped = re.escape(name)
+        if chunk and length + len(escaped) + 4 > max_length:
+            patterns.append(("^({})$".format("|".join(re.escape(n) for n in chunk)),
+                             chunk))
+            chunk = []
+            length = 0
+        chunk.append(name)
+        length += len(escaped) + 1
+    if chunk:
+        patterns.append(("^({})$".format("|".join(re.escape(n) for n in chunk)),
+                         chunk))
+    return patterns
+
+def _name_filter(class_name, pattern, filter_type, case_sensitive=True):
+    """Search criteria DTO matching class_name objects by a name pattern"""
+    return {"className": class_name,
+            "logicalOperator": "AND",
+            "criteriaList": [{"expType": "RXEQ",
+                              "expVal": pattern,
+                              "caseSensitive": case_sensitive,
+                              "filterType": filter_type}]}
+
+def _entity_filter_type(entity_type):
+    """vmtconnect's name filter type for entity_type, None if it has none"""
+    vmtconnect = _vmtconnect()
+    if vmtconnect is None:
+        return None
+    prefix = getattr(vmtconnect, "_class_filter_prefix", {}).get(entity_type)
+    return "{}ByName".format(prefix) if prefix else None
+
+def _search_names(conn, entity_type, pattern, names, case_sensitive=True):
+    """Entities of entity_type whose names match pattern, a pattern of names.
+
+    Entity types without a vmtconnect name filter type are searched one name
+    at a time with search_by_name.
+    """
+    filter_type = _entity_filter_type(entity_type)
+    if filter_type is not None:
+        dto = _name_filter(entity_type, pattern, filter_type,
+                           case_sensitive=case_sensitive)
+        return conn.search(dto=json.dumps(dto), fetch_all=True)
+    entities = []
+    for name in names:
+        entities.extend(conn.search_by_name(name, type=entity_type,
+                                            case_sensitive=case_sensitive,
+                                            fetch_all=True) or [])
+    return entities
+
+def _groups_named(conn, name):
+    """Groups whose display name is exactly name"""
+    groups = GroupUpdateUtility(conn).get_group_index(values=[], names=[name])
+    return [g for g in groups.get(name, []) if g.get("displayName") == name]
+
+def _iter_pages(response):
+    """Yields pages of a vmtconnect Pager, or a fetched list as one page"""
+    if isinstance(response, list):
+        yield response
+        return
+    while not response.complete:
+        yield response.next
+
+def _unique(items):
+    """Items without duplicates, in order of their first occurrence"""
+    seen = set()
+    unique = []
+    for item in items:
+        if item not in seen:
+            seen.add(item)
+            unique.append(item)
+    return unique
+
+def _unique_uuid(entity_type, name, uuids, active_only=False):
+    """Returns the single uuid matching a name
+
+    Raises:
+        NameMatchError: If uuids is empty
+        MultipleMatchingNamesError: If uuids has more than one uuid
+    """
+    if len(uuids) == 0:
+        raise NameMatchError("Could not find {} {}".format(entity_type, name))
+    if len(uuids) == 1:
+        return uuids[0]
+    if active_only:
+        raise MultipleMatchingNamesError("More than one Active instance of"
+                                         " {} {} found".format(entity_type,
+                                                               name))
+    raise MultipleMatchingNamesError("More than one instance of"
+                                     " {} {} found".format(entity_type, name))
+
+def _partition_matches(name_uuids):
+    """Splits (name, uuids) pairs as returned by EntityIndex.partition"""
+    matched = {}
+    missing = []
+    ambiguous = {}
+    for name, uuids in name_uuids:
+        if len(uuids) == 0:
+            missing.append(name)
+        elif len(uuids) == 1:
+            matched[name] = uuids[0]
+        else:
+            ambiguous[name] = list(uuids)
+    return {"matched": matched, "missing": missing, "ambiguous": ambiguous}
+
+def _member_digest(members, no_add=False, no_remove=False):
+    """Digest of a desired member uuid set and the update mode"""
+    import hashlib
+    digest = hashlib.sha1("{}{}".format(int(no_add), int(no_remove)).encode())
+    for uuid in sorted(set(members)):
+        digest.update(b"\n")
+        digest.update(uuid.encode())
+    return digest.hexdigest()
+
+def _run_digest(csv_file, target, groups=None, **options):
+    """Digest of a csv file, the target and the options of a run
+
+    stdin can only be read once, so the groups parsed from it are digested
+    instead of the csv.
+    """
+    import hashlib
+    digest = hashlib.sha1(json.dumps([target, options], sort_keys=True).encode())
+    if csv_file == STDIN_CSV:
+        for group in sorted(groups, key=lambda g: (g["name"], g["entity_type"])):
+            digest.update(json.dumps([group["name"], group["entity_type"],
+                                      sorted(group["members"])]).encode())
+        return digest.hexdigest()
+    with open(csv_file, "rb") as csv_in:
+        for chunk in iter(partial(csv_in.read, 1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _plan_group(conn, group, no_add=False, no_remove=False, cache=None,
+                verify_all=False, metrics=None):
+    """Finds the change needed to sync a single parsed group.
+
+    With a cache, the group is skipped without fetching members if its
+    desired members and live server member count match the last sync.
+
+    Returns:
+        Tuple of COMMIT_ADD, COMMIT_UPDATE or None if the group is up to
+        date, and the StaticGroup.plan output if members were compared.
+    """
+    if group["uuid"] is None:
+        return COMMIT_ADD, None
+
+    if (cache is not None and not verify_all
+            and group.get("members_count") is not None
+            and cache.get_digest(group["uuid"]) == (_member_digest(group["members"],
+                                                                   no_add, no_remove),
+                                                    group["members_count"])):
+        return None, None
+
+    if metrics is None:
+        metrics = _RunMetrics()
+    # Find group differences from a single member fetch
+    with metrics.phase(PHASE_DIFF):
+        group_instance = StaticGroup(conn, group["name"], group["entity_type"],
+                                     group["members"], uuid=group["uuid"])
+        current_members = [m["uuid"] for m in group_instance.get_current_members()]
+        plan = group_instance.plan(current_members=current_members,
+                                   allow_add=not no_add,
+                                   allow_remove=not no_remove)
+    if plan["add"] or plan["remove"]:
+        return COMMIT_UPDATE, plan
+    return None, plan
+
+def _refresh_group(conn, group, cache, registry=None):
+    """Looks up a group with a stale cached uuid again by its exact name
+
+    Raises:
+        NoMatchingGroupError: If no group has the name any more.
+        DuplicateMatchingGroupError: If multiple groups have the name.
+    """
+    if registry is not None:
+        matches = registry.refresh(group["name"])
+    else:
+        matches = _groups_named(conn, group["name"])
+    if not matches:
+        raise NoMatchingGroupError("No group found matching"
+                                   " name '{}'".format(group["name"]))
+    if len(matches) > 1:
+        raise DuplicateMatchingGroupError("Found multiple groups matching"
+                                          " name {}".format(group["name"]))
+    group["uuid"] = matches[0]["uuid"]
+    group["members_count"] = matches[0].get("membersCount")
+
+def _group_error(group, error, cache=None):
+    """Tracking event for a group that could not be added or updated"""
+    if cache is not None:
+        # Member uuids may be stale, refetch them on the next run
+        cache.invalidate(entity_type=group["entity_type"])
+    event = (group["name"], "Could not add or update '{}'. {}".format(group["name"], error))
+    return (TRK_ERROR, event, {"level": "error"})
+
+def _manage_group(conn, group, no_add=False, no_remove=False, cache=None,
+                  verify_all=False, metrics=None, registry=None):
+    """Plans the change for a single parsed group and tracks failures.
+
+    If the group uuid came from the cache and no longer exists, the group is
+    looked up again by name and planned once more.
+
+    Returns:
+        Tuple of the action and plan from _plan_group, and a list of
+        (category, event, track kwargs) tuples to pass to
+        _EventTracker.track if planning failed.
+    """
+    if metrics is None:
+        metrics = _RunMetrics()
+    kwargs = {"no_add": no_add, "no_remove": no_remove, "cache": cache,
+              "verify_all": verify_all, "metrics": metrics}
+    try:
+        try:
+            action, plan = _plan_group(conn, group, **kwargs)
+        except Exception as e:
+            if cache is None or group["uuid"] is None or not _is_not_found(e):
+                raise
+            # Cached uuid is stale, refresh this group only
+            with metrics.phase(PHASE_DIFF):
+                _refresh_group(conn, group, cache, registry=registry)
+            action, plan = _plan_group(conn, group, **kwargs)
+        return action, plan, []
+    except Exception as e:
+        return None, None, [_group_error(group, e, cache)]
+
+def _record_group(group, action, plan=None, response=None, no_add=False,
+                  no_remove=False, dryrun=False, cache=None):
+    """Caches the synced members of a single parsed group.
+
+    Returns:
+        List of (category, event, track kwargs) tuples to pass to
+        _EventTracker.track in order.
+    """
+    digest = _member_digest(group["members"], no_add, no_remove)
+    if action == COMMIT_ADD:
+        uuid = _response_uuid(response)
+        if cache is not None and not dryrun and uuid is not None:
+            cache.set_digest(uuid, digest, len(set(group["members"])))
+        event = (group["name"], "Added {} ({} {}s)".format(group["name"],
+                                              len(group["members"]),
+                                              group["entity_type"]))
+        return [(TRK_ADD, event, {})]
+
+    if plan is not None and cache is not None and not dryrun:
+        cache.set_digest(group["uuid"], digest, len(plan["members"]))
+    if action == COMMIT_UPDATE:
+        change_string = []
+        if no_remove is False:
+            change_string += ["{} removed".format(len(plan["remove"]))]
+        if no_add is False:
+            change_string += ["{} added".format(len(plan["add"]))]
+        event = (group["name"], "{} Updated ({})".format(group["name"], " ".join(change_string)))
+        return [(TRK_UPDATE, event, {"level": "info"})]
+    event = (group["name"], "{} is already up to date".format(group["name"]))
+    return [(TRK_SKIP, event, {"level": "info"})]
+
+## ----------------------------------------------------
+##   Main Function
+## ----------------------------------------------------
+
+def build_anti_groups(groups, entity_index, case_sensitive=True):
+    """Creates "anti-groups" with every entity not specified for each group.
+
+    Entity uuids are partitioned by type once and each complement is a set
+    difference of uuids, so no names are looked up on the server.
+
+    Args:
+        groups (list): Groups as returned by CSVGroupParser.parse, with
+            entity names as members.
+        entity_index (EntityIndex): Index of every entity of the groups'
+            entity types.
+        case_sensitive (bool, optional): If False, names will be matched
+            without case sensitivity.
+
+    Returns:
+        List of copies of groups where "members" are the uuids of every
+        entity that is not named in the group and "missing" are the names
+        that could not be found::
+
+            {
+             "name": ""
+             "entity_type": ""
+             "members": []
+             "missing": []
+            }
+    """
+    all_uuids = {}
+    anti_groups = []
+    for group in groups:
+        e_type = group["entity_type"]
+        if e_type not in all_uuids:
+            all_uuids[e_type] = entity_index.uuids(e_type)
+        excluded = set()
+        missing = []
+        for name in group["members"]:
+            # Every entity sharing a name is excluded from the anti-group
+            matches = entity_index.lookup_all(e_type, name,
+                                              case_sensitive=case_sensitive)
+            if not matches:
+                missing.append(name)
+            excluded.update(m.uuid for m in matches)
+        anti_group = dict(group)
+        anti_group["members"] = list(all_uuids[e_type].difference(excluded))
+        anti_group["missing"] = missing
+        anti_groups.append(anti_group)
+    return anti_groups
+
+def main(conn, csv_file, entity_type_header=ENTITY_TYPE_HEADER,
+         entity_name_header=ENTITY_NAME_HEADER, group_headers=[],
+         no_add=False, no_remove=False, delete=False, case_sensitive=True,
+         group_delimiter=GROUP_DELIMITER, dryrun=False, active_only=False,
+         lookup_method=LOOKUP_AUTO, workers=1, cache=None,
+         cache_ttl=CACHE_TTL, clear_cache=False, verify_all=False,
+         run_async=False, anti_groups=False, commit_batch_size=COMMIT_BATCH_SIZE,
+         commit_rate=COMMIT_RATE, journal=None, resume=False, delta=False,
+         groups=None, parse_workers=1):
+    """
+        Parses groups from CSV and adds/updates/deletes groups.
+        Efficiently collects group and entity uuids to minimize api requests.
+
+    Args:
+        conn (VMTConnection): VMTConnection instance to target Turbonomic Server
+        csv_file (str): Path to Target CSV
+        entity_type_header (str, optional): CSV header for column that contains
+            entity types.
+        entity_name_header (str, optional): CSV header for column that contains
+            entity names.
+        group_headers (list, optional): List of CSV headers to group members by
+            in order. If empty list, all headers except entity_type_header, and
+            entity_name_header are used from left to right.
+        no_add (bool, optional): If True, adding current entities to group is
+            disabled.
+        no_remove (bool, optional): If True, removing current entities from a
+            group is disabled
+        delete (bool, optional): If True, groups matching names from csv are
+            deleted
+        case_sensitive (bool, optional): If True, entities will be matched with
+            case-sensitivity
+        dryrun (bool, optional): If True, changes are not committed to the
+            target Turbonomic server.
+        active_only (bool, optional): If True and multiple entities share a
+            name, only the ACTIVE entity is added.
+        lookup_method (str, optional): LOOKUP_BULK fetches every entity of
+            each type once, LOOKUP_NAME searches the server once per name,
+            LOOKUP_REGEX searches many names at once with name patterns.
+            LOOKUP_AUTO picks LOOKUP_REGEX for entity types with few csv
+            names compared to the entities on the server, and LOOKUP_BULK
+            otherwise, see EntityNameResolver.prefetch_names.
+        workers (int, optional): Number of requests to run concurrently
+            when listing, looking up names and adding/updating groups.
+        cache (str, optional): Path to a SyncCache file used to store entity
+            uuids and synced group member digests between runs.
+        cache_ttl (int, optional): Seconds before cached uuids are refetched.
+        clear_cache (bool, optional): If True, cached uuids for the target
+            are removed before the run.
+        verify_all (bool, optional): If True, members of every existing
+            group are fetched even if the cache shows the group is unchanged.
+        run_async (bool, optional): If True, concurrent requests are run as
+            asyncio coroutines, capped by workers.
+        anti_groups (bool, optional): If True, each group is given every
+            entity of its type that is NOT listed for it in the csv, see
+            build_anti_groups.
+        commit_batch_size (int, optional): Number of group adds, updates or
+            deletes committed before waiting for the batch to finish. If 0,
+            all changes are one batch.
+        commit_rate (float, optional): Maximum group adds, updates or deletes
+            committed per second. If 0, commits are not rate limited.
+        journal (str, optional): Path to a SyncJournal file the run is
+            recorded to. Not used when deleting groups.
+        resume (bool, optional): If True, an unfinished run of the same csv
+            and options recorded in journal is resumed. Groups it already
+            resolved and synced are not processed again, and their events
+            are included in the returned dictionary.
+        delta (bool, optional): If True, csv groups whose name, type and
+            member names are unchanged since the last sync recorded in cache
+            are skipped without resolving names or fetching members. Groups
+            with missing entities or errors are always processed again.
+            Requires cache, not used for anti_groups or when deleting.
+        groups (list, optional): Groups already parsed from csv_file, e.g. by
+            sync_targets. The groups are copied, so the same list can be
+            passed to several runs. If None, csv_file is parsed.
+        parse_workers (int, optional): Number of processes parsing the csv,
+            see CSVGroupParser.iter_groups.
+
+    Returns:
+        Dictionary with change events and totals for each change category,
+        and run metrics under RUN_METRICS. Phase wall times span from the
+        first to the last worker in the phase, busy times are summed across
+        workers. Latencies are in seconds. name_lookups counts names the
+        ResolutionMemo answered (hits) and names searched on the server
+        (misses) by LOOKUP_NAME and LOOKUP_REGEX, it is not included when
+        deleting groups.
+
+        e.g. ::
+
+            {"Change Category A": {
+                 "total": int
+                 "events":[
+                     {"group name": str,
+                      "message": str}
+                    ]
+                },
+             RUN_METRICS: {
+                 "wall_time": float
+                 "phases": {
+                     "phase": {"wall_time": float,
+                               "busy_time": float,
+                               "api_calls": {"method": int}}
+                    }
+                 "api_latency": {
+                     "method": {"calls": int, "errors": int, "max": float,
+                                "p50": float, "p90": float, "p99": float}
+                    }
+                 "name_lookups": {"hits": int, "misses": int, "names": int}
+                }}
 
     """
     # Create an _EventTracker instance
     group_changes = _EventTracker()
-
-    # Parse CSV groups and members
-    csv_group_parser = CSVGroupParser(entity_type_header, entity_name_header)
-    groups = csv_group_parser.parse(csv_file, group_headers=group_headers)
+    metrics = _RunMetrics()
+
+    # Retry requests rejected by a busy server
+    commit_conn = _ThrottledConnection(conn, metrics=metrics, phase=PHASE_COMMIT)
+    resolve_conn = _ThrottledConnection(conn, metrics=metrics, phase=PHASE_RESOLVE)
+    conn = _ThrottledConnection(conn, metrics=metrics)
+
+    # Resume an unfinished run from its journal
+    sync_journal = None
+    resumed = None
+    if journal and not delete:
+        if groups is None and csv_file == STDIN_CSV:
+            # stdin can only be read once, parse it before taking the digest
+            with metrics.phase(PHASE_PARSE):
+                csv_group_parser = CSVGroupParser(entity_type_header, entity_name_header)
+                groups = list(csv_group_parser.iter_groups(csv_file,
+                                                           group_headers=group_headers))
+        run_id = _run_digest(csv_file, getattr(conn, "host", ""), groups=groups,
+                             entity_type_header=entity_type_header,
+                             entity_name_header=entity_name_header,
+                             group_headers=group_headers, no_add=no_add,
+                             no_remove=no_remove, case_sensitive=case_sensitive,
+                             group_delimiter=group_delimiter, dryrun=dryrun,
+                             active_only=active_only, anti_groups=anti_groups)
+        sync_journal = SyncJournal(journal)
+        if resume:
+            resumed = sync_journal.load(run_id)
+            if resumed is None:
+                _msg("No unfinished run of this csv in {}, starting a new"
+                     " run".format(journal), warn=True)
+        sync_journal.start(run_id, resume=resumed is not None)
+    groups_resolved = resumed is not None and resumed["groups"] is not None
+
+    if groups_resolved:
+        # Groups were parsed and resolved before the run stopped
+        _msg("Resuming run, {} groups already synced".format(len(resumed["synced"])),
+             level="info")
+        groups = resumed["groups"]
+        for category, attr in resumed["changes"].items():
+            for event in attr["events"]:
+                group_changes.track(category, (event["group name"], event["message"]),
+                                    msg=False)
+    elif groups is not None:
+        # Members are overwritten with uuids, keep the caller's groups intact
+        groups = [dict(group, members=list(group["members"])) for group in groups]
+    else:
+        # Parse CSV groups and members
+        with metrics.phase(PHASE_PARSE):
+            csv_group_parser = CSVGroupParser(entity_type_header, entity_name_header)
+            groups = list(csv_group_parser.iter_groups(csv_file,
+                                                       group_headers=group_headers,
+                                                       workers=parse_workers))
 
     # Create a GroupUpdateUtility instance
     group_utils = GroupUpdateUtility(conn)
 
-    # Attempt to find group uuids now to minimize api calls
-    group_index = group_utils.get_group_index()
+    sync_cache = None
+    if cache:
+        sync_cache = SyncCache(cache, getattr(conn, "host", ""), ttl=cache_ttl)
+        if clear_cache:
+            sync_cache.invalidate()
+
+    if not delete:
+        # Groups listed more than once with the same entity type are merged
+        # into one commit, a group name is only synced for the first entity
+        # type it is listed with
+        first_groups = {}
+        sync_groups = []
+        for group in groups:
+            first = first_groups.setdefault(group["name"], group)
+            if first is group:
+                sync_groups.append(group)
+            elif first["entity_type"] == group["entity_type"]:
+                first["members"] = _unique(first["members"] + group["members"])
+            else:
+                error = CommitConflictError("Cannot sync '{}' as {}, it is already"
+                                            " listed as {}".format(group["name"],
+                                                                   group["entity_type"],
+                                                                   first["entity_type"]))
+                category, event, kwargs = _group_error(group, error)
+                group_changes.track(category, event, **kwargs)
+        groups = sync_groups
+
+    fingerprints = None
+    synced_keys = set()
+    if delta and sync_cache is not None and not delete and not anti_groups \
+            and not groups_resolved:
+        # Only csv groups that changed since the last sync are processed
+        previous = {}
+        if not verify_all:
+            previous = sync_cache.get_fingerprints()
+        fingerprints = {}
+        changed_groups = []
+        for group in groups:
+            key = (group["name"], group["entity_type"])
+            fingerprints[key] = _group_fingerprint(group, no_add=no_add,
+                                                   no_remove=no_remove,
+                                                   case_sensitive=case_sensitive,
+                                                   active_only=active_only)
+            if previous.get(key) != fingerprints[key]:
+                changed_groups.append(group)
+                continue
+            synced_keys.add(key)
+            event = (group["name"], "{} is unchanged since the last"
+                                    " run".format(group["name"]))
+            group_changes.track(TRK_SKIP, event, level="info")
+        groups = changed_groups
+
+    # Allow one pooled connection per concurrent request
+    _size_connection_pool(conn, workers)
+
+    def load_group_index():
+        # Attempt to find group uuids now to minimize api calls
+        with metrics.phase(PHASE_GROUP_INDEX):
+            if not groups:
+                # Nothing to sync, the registry lists groups if needed
+                return None
+            # Only csv group names are looked up in the index. Always listed
+            # live, cached digests are checked against server member counts
+            return group_utils.get_group_index(values=["uuid", "membersCount"],
+                                               names=[g["name"] for g in groups])
+
+    if anti_groups:
+        # Anti-groups need every entity of each type
+        lookup_method = LOOKUP_BULK
+    resolver = EntityNameResolver(resolve_conn, case_sensitive=case_sensitive,
+                                  active_only=active_only,
+                                  method=lookup_method, cache=sync_cache)
+
+    def prefetch_entities():
+        # Fetch every entity type found in the csv at once
+        if not delete and not groups_resolved:
+            with metrics.phase(PHASE_RESOLVE):
+                if lookup_method in [LOOKUP_REGEX, LOOKUP_AUTO]:
+                    names = {}
+                    for group in groups:
+                        names.setdefault(group["entity_type"], []).extend(group["members"])
+                    resolver.prefetch_names(names, workers=workers)
+                else:
+                    resolver.prefetch([g["entity_type"] for g in groups])
+
+    # Group and entity listings are independent, fetch them together
+    group_index, _ = _map_concurrent(lambda task: task(),
+                                     [load_group_index, prefetch_entities],
+                                     workers=workers, run_async=run_async)
 
     for group in groups:
         uuid = None
+        members_count = None
         if group["name"] in group_index:
             if len(group_index[group["name"]]) == 1:
                 uuid = group_index[group["name"]][0]["uuid"]
+                members_count = group_index[group["name"]][0].get("membersCount")
         group["uuid"] = uuid
+        group["members_count"] = members_count
+
+    # Changes are committed in batches from a single ordered queue
+    # Groups added or removed by this run are checked against one listing
+    registry = GroupRegistry(conn, group_index)
+    commit_queue = CommitQueue(commit_conn, batch_size=commit_batch_size,
+                               rate_limit=commit_rate, workers=workers,
+                               dryrun=dryrun, run_async=run_async,
+                               registry=registry)
 
     if delete:
         # Delete groups and return
         for group in groups:
-            if not group["uuid"]:
-                continue
-            group_instance = StaticGroup(conn, group["name"],group["entity_type"],
-                                         uuid=group["uuid"])
+            if group["uuid"]:
+                commit_queue.put(COMMIT_DELETE, group)
+        with metrics.phase(PHASE_COMMIT):
+            for entry, _, error in commit_queue.dispatch():
+                if error is None:
+                    event = (entry["name"], "Deleted {}".format(entry["name"]))
+                    group_changes.track(TRK_DELETE, event)
+                else:
+                    event = (entry["name"], "Could not delete group. {}".format(error))
+                    group_changes.track(TRK_ERROR, event, level="error")
+        change_dict = group_changes.to_dict()
+        change_dict[RUN_METRICS] = metrics.to_dict()
+        return change_dict
+
+    if not groups_resolved:
+        if anti_groups:
+            with metrics.phase(PHASE_RESOLVE):
+                groups = build_anti_groups(groups, resolver.index,
+                                           case_sensitive=case_sensitive)
+            for group in groups:
+                for member in group["missing"]:
+                    event = (group["name"], "Could not find {} {}".format(group["entity_type"],
+                                                                          member))
+                    group_changes.track(TRK_MISS_ENTITY, event, warn=True)
+
+        # Collect entity uuids and warn if they aren't found
+        def resolve_member(group_member):
+            entity_type, member = group_member
             try:
-                group_instance.remove(dryrun=dryrun)
-                event = (group["name"], "Deleted {}".format(group["name"]))
-                group_changes.track(TRK_DELETE, event)
-            except Exception as e:
-                event = (group["name"], "Could not delete group. {}".format(e))
-                group_changes.track(TRK_ERROR, event, level='error')
-        return group_changes.to_dict()
-
-    # Collect entity uuids and warn if they aren't found
-    missing_members = []
-    for group in groups:
-        discovered_members = []
-        for member in group["members"]:
-            if member in missing_members:
-                continue
-            matches = conn.search_by_name(member, type=group["entity_type"],
-                                          case_sensitive=case_sensitive,
-                                          fetch_all=True)
-            if len(matches) == 0:
-                event = (group["name"], "Could not find {} {}".format(group["entity_type"],
-                                                                      member))
-                group_changes.track(TRK_MISS_ENTITY, event, warn=True)
-            elif len(matches) > 1:
-                
-                # With Active only check if more than one result in the search is active
-                if active_only:
-                    count = 0
-                    for match in matches:
-                        if match['state'] == 'ACTIVE':
-                            count += 1
-                            j = match["uuid"]
-
-                    if count == 1:
-                        discovered_members.append(j)
+                return resolver.resolve(entity_type, member), None
+            except LookupNameError as e:
+                return None, e
+
+        def search_member(group_member):
+            # Workers count their own searches against name resolution
+            with metrics.phase(PHASE_RESOLVE):
+                return resolve_member(group_member)
+
+        with metrics.phase(PHASE_RESOLVE):
+            group_members = [(g["entity_type"], m) for g in groups for m in g["members"]]
+            if anti_groups:
+                # Members are already uuids
+                resolved = [(m, None) for _, m in group_members]
+            elif lookup_method != LOOKUP_NAME:
+                # Names were prefetched, no requests to overlap
+                resolved = map(resolve_member, group_members)
+            else:
+                # Search each distinct name once, repeats are answered by the memo
+                first = {}
+                for i, (e_type, member) in enumerate(group_members):
+                    first.setdefault(ResolutionMemo.key(e_type, member,
+                                                        case_sensitive,
+                                                        active_only), i)
+                searched = dict(zip(first.values(),
+                                    _map_concurrent(search_member,
+                                                    [group_members[i] for i in first.values()],
+                                                    workers=workers,
+                                                    run_async=run_async)))
+                resolved = (searched[i] if i in searched else resolve_member(m)
+                            for i, m in enumerate(group_members))
+            resolved = iter(resolved)
+            for group in groups:
+                discovered_members = []
+                for member in group["members"]:
+                    uuid, error = next(resolved)
+                    if error is None:
+                        discovered_members.append(uuid)
                     else:
-                        msg_str = (group["name"], "More than one Active instance of"
-                                " {} {} found".format(group["entity_type"],
-                                                        member))
-                        group_changes.track(TRK_MISS_ENTITY, msg_str, warn=True)
-                else:
-                    msg_str = (group["name"], "More than one instance of"
-                            " {} {} found".format(group["entity_type"],
-                                                    member))
-                    group_changes.track(TRK_MISS_ENTITY, msg_str, warn=True)
+                        event = (group["name"], str(error))
+                        group_changes.track(TRK_MISS_ENTITY, event, warn=True)
+                # Overwrite members with uuids
+                group["members"] = discovered_members
+        if sync_journal is not None:
+            sync_journal.resolved(groups, group_changes.to_dict())
+
+    # Plan group changes
+    def manage_group(group):
+        return _manage_group(conn, group, no_add=no_add, no_remove=no_remove,
+                             cache=sync_cache, verify_all=verify_all,
+                             metrics=metrics, registry=registry)
+
+    record_kwargs = {"no_add": no_add, "no_remove": no_remove, "dryrun": dryrun,
+                     "cache": sync_cache}
+
+    def finish_group(group, events, synced=True):
+        for category, event, kwargs in events:
+            group_changes.track(category, event, **kwargs)
+        if synced:
+            synced_keys.add((group["name"], group["entity_type"]))
+        if synced and sync_journal is not None:
+            sync_journal.synced(group, [(c, e) for c, e, _ in events])
+
+    def queue_group(group, action, plan, events):
+        if action is not None:
+            try:
+                commit_queue.put(action, group, plan=plan)
+            except CommitConflictError as e:
+                finish_group(group, [_group_error(group, e)], synced=False)
+        elif events:
+            finish_group(group, events, synced=False)
+        else:
+            finish_group(group, _record_group(group, action, plan=plan,
+                                              **record_kwargs))
+
+    def commit_groups(retry_stale=False):
+        # Commit queued changes and return groups to plan again
+        stale_groups = []
+        with metrics.phase(PHASE_COMMIT):
+            for entry, response, error in commit_queue.dispatch():
+                for group in entry["groups"]:
+                    if error is None:
+                        finish_group(group, _record_group(group, entry["action"],
+                                                          plan=entry["plan"],
+                                                          response=response,
+                                                          **record_kwargs))
+                    elif (retry_stale and entry["action"] == COMMIT_UPDATE
+                            and _is_not_found(error)):
+                        stale_groups.append(group)
+                    else:
+                        finish_group(group, [_group_error(group, error, sync_cache)],
+                                     synced=False)
+        return stale_groups
+
+    sync_groups = groups
+    if resumed is not None:
+        # Groups synced before the run stopped are only tracked
+        unsynced_groups = []
+        for group in sync_groups:
+            events = resumed["synced"].get((group["name"], group["entity_type"]))
+            if events is None:
+                unsynced_groups.append(group)
+                continue
+            for category, name, message in events:
+                group_changes.track(category, (name, message), msg=False)
+        sync_groups = unsynced_groups
+
+    for group, planned in zip(sync_groups, _map_concurrent(manage_group, sync_groups,
+                                                           workers=workers,
+                                                           run_async=run_async)):
+        queue_group(group, *planned)
+    stale_groups = commit_groups(retry_stale=sync_cache is not None)
+
+    # Cached uuids are stale, look the groups up again and retry once
+    for group in stale_groups:
+        try:
+            with metrics.phase(PHASE_DIFF):
+                _refresh_group(conn, group, sync_cache, registry=registry)
+        except Exception as e:
+            finish_group(group, [_group_error(group, e, sync_cache)], synced=False)
+            continue
+        queue_group(group, *manage_group(group))
+    commit_groups()
+
+    if fingerprints is not None and not dryrun:
+        # Groups with missing entities are processed again on the next run
+        missing = set(e["group name"] for e in
+                      group_changes.to_dict().get(TRK_MISS_ENTITY, {}).get("events", []))
+        sync_cache.set_fingerprints({key: fingerprint
+                                     for key, fingerprint in fingerprints.items()
+                                     if key in synced_keys and key[0] not in missing})
+
+    if sync_journal is not None:
+        sync_journal.complete()
+        sync_journal.close()
+
+    change_dict = group_changes.to_dict()
+    change_dict[RUN_METRICS] = metrics.to_dict()
+    change_dict[RUN_METRICS]["name_lookups"] = resolver.memo.to_dict()
+    return change_dict
+
+def sync_targets(targets, csv_file, entity_type_header=ENTITY_TYPE_HEADER,
+                 entity_name_header=ENTITY_NAME_HEADER, group_headers=[],
+                 target_workers=None, journal=None, cache=None, parse_workers=1,
+                 **kwargs):
+    """
+        Parses groups from CSV once and syncs them to several Turbonomic
+        servers concurrently, see main. A target that fails does not stop
+        the others.
 
-            else:
-                discovered_members.append(matches[0]["uuid"])
-        # Overwrite members with uuids
-        group["members"] = discovered_members
+    Args:
+        targets (dict): Turbonomic server addresses mapped to VMTConnection
+            instances, or to functions that return one. Functions are called
+            from the target's worker, so a failed login only fails its target.
+        csv_file (str): Path to Target CSV
+        entity_type_header (str, optional): CSV header for column that contains
+            entity types.
+        entity_name_header (str, optional): CSV header for column that contains
+            entity names.
+        group_headers (list, optional): List of CSV headers to group members by
+            in order, see main.
+        target_workers (int, optional): Number of targets synced concurrently.
+            If None, every target is synced at once.
+        journal (str, optional): Path prefix of the SyncJournal files. Each
+            target is recorded to "<journal>.<target>".
+        cache (str, optional): Path prefix of the SyncCache files. Each
+            target is cached in "<cache>.<target>", so concurrent targets
+            never write to the same SQLite database.
+        parse_workers (int, optional): Number of processes parsing the csv,
+            see CSVGroupParser.iter_groups.
+        **kwargs: Other main arguments, used for every target.
 
-    # Manage groups
-    for group in groups:
-        group_instance = StaticGroup(conn, group["name"], group["entity_type"],
-                                     group["members"], uuid=group["uuid"])
+    Returns:
+        Dictionary with change events and totals of all targets, each event
+        also names its target. A target that could not be synced is tracked
+        as an error. RUN_TARGETS holds the error and run metrics of each
+        target, metrics are None for a failed target.
+
+        e.g. ::
+
+            {"Change Category A": {
+                 "total": int
+                 "events":[
+                     {"group name": str,
+                      "message": str,
+                      "target": str}
+                    ]
+                },
+             RUN_TARGETS: {
+                 "target": {"error": str or None,
+                            RUN_METRICS: dict or None}
+                }}
+
+    """
+    targets = dict(targets)
+    csv_group_parser = CSVGroupParser(entity_type_header, entity_name_header)
+    groups = list(csv_group_parser.iter_groups(csv_file,
+                                               group_headers=group_headers,
+                                               workers=parse_workers))
+
+    def sync_target(target):
         try:
-            if group["uuid"] is None:
-                group_instance.add(dryrun=dryrun)
-                event = (group["name"], "Added {} ({} {}s)".format(group["name"],
-                                                      len(group["members"]),
-                                                      group["entity_type"]))
-                group_changes.track(TRK_ADD, event)
+            conn = targets[target]
+            if callable(conn):
+                conn = conn()
+            target_journal = "{}.{}".format(journal, target) if journal else None
+            target_cache = "{}.{}".format(cache, target) if cache else None
+            return main(conn, csv_file, entity_type_header=entity_type_header,
+                        entity_name_header=entity_name_header,
+                        group_headers=group_headers, journal=target_journal,
+                        cache=target_cache, groups=groups, **kwargs), None
+        except Exception as e:
+            _msg("Could not sync {}: {}".format(target, e), level="error",
+                 error=True)
+            return None, e
+
+    names = list(targets)
+    results = _map_concurrent(sync_target, names,
+                              workers=target_workers or len(names))
+
+    # Merge the change events of every target
+    change_dict = {}
+    target_runs = {}
+    for target, (target_dict, error) in zip(names, results):
+        if error is not None:
+            target_dict = {TRK_ERROR: {"total": 1, "events": [
+                {"group name": None,
+                 "message": "Could not sync {}. {}".format(target, error)}]}}
+            target_runs[target] = {"error": str(error), RUN_METRICS: None}
+        else:
+            target_runs[target] = {"error": None,
+                                   RUN_METRICS: target_dict.get(RUN_METRICS)}
+        for category, attr in target_dict.items():
+            if category == RUN_METRICS:
+                continue
+            merged = change_dict.setdefault(category, {"total": 0, "events": []})
+            merged["total"] += attr["total"]
+            merged["events"].extend(dict(event, target=target)
+                                    for event in attr["events"])
+    change_dict[RUN_TARGETS] = target_runs
+    return change_dict
+
+def export_groups(conn, output_csv, include_group_type=False, all_groups=False,
+                  group_names=[], workers=1):
+    """
+        Exports group members to a CSV that can be imported with main().
+        Rows are written in group order as soon as the members of each
+        group and the groups before it are fetched.
 
+    Args:
+        conn (VMTConnection): VMTConnection instance to target Turbonomic Server
+        output_csv (str): Path to output CSV
+        include_group_type (bool, optional): If True, a column indicates if
+            each group is static or dynamic.
+        all_groups (bool, optional): If True, non-custom groups are exported
+            as well.
+        group_names (list, optional): Only export groups with exactly these
+            names. Names are searched as in GroupUpdateUtility.get_group_index
+            instead of listing all groups.
+        workers (int, optional): Number of groups to fetch members for
+            concurrently.
+
+    Returns:
+        int: Number of exported groups
+
+    Raises:
+        DuplicateMatchingGroupError: If multiple groups share one of
+            group_names.
+    """
+    # Retry requests rejected by a busy server
+    conn = _ThrottledConnection(conn)
+    _size_connection_pool(conn, workers)
+
+    if group_names:
+        groups = []
+        group_index = GroupUpdateUtility(conn).get_group_index(values=[],
+                                                               names=group_names)
+        for name in _unique(group_names):
+            matches = group_index.get(name, [])
+            if not matches:
+                _msg("Could not find group {}".format(name), warn=True)
+            elif len(matches) > 1:
+                raise DuplicateMatchingGroupError("Found multiple groups matching"
+                                                  " name {}".format(name))
             else:
-                # Find and log group differences
-                diffs = group_utils.get_group_diff(group["uuid"],
-                                                   group["members"])
-                elligible_changes = []
-                change_string = []
-                if no_remove is False:
-                    elligible_changes += diffs["remove"]
-                    change_string += ["{} removed".format(len(diffs["remove"]))]
-                if no_add is False:
-                    elligible_changes += diffs["add"]
-                    change_string += ["{} added".format(len(diffs["add"]))]
-                sum_diffs = len(elligible_changes)
-
-                # Only update if needed
-                if sum_diffs > 0:
-                    group_instance.update(dryrun=dryrun, allow_add=not no_add,
-                                          allow_remove=not no_remove)
-                    event = (group["name"], "{} Updated ({})".format(group["name"], " ".join(change_string)))
-                    group_changes.track(TRK_UPDATE, event, level="info")
-                else:
-                    event = (group["name"], "{} is already up to date".format(group["name"]))
-                    group_changes.track(TRK_SKIP, event, level="info")
-        except Exception as e:
-            event = (group["name"], "Could not add or update '{}'. {}".format(group["name"],e))
-            group_changes.track(TRK_ERROR, event, level="error")
+                groups.append(matches[0])
+    elif all_groups:
+        groups = conn.get_groups(fetch_all=True)
+    else:
+        groups = conn.request("/groups/GROUP-MyGroups/members", fetch_all=True)
+
+    headers = [ENTITY_TYPE_HEADER, ENTITY_NAME_HEADER, GROUP_NAME_HEADER]
+    if include_group_type:
+        headers.append(GROUP_TYPE_HEADER)
+
+    def group_rows(group):
+        group_instance = StaticGroup(conn, group["displayName"],
+                                     group["groupType"], uuid=group["uuid"])
+        rows = []
+        for entity in group_instance.get_current_members():
+            row = {ENTITY_TYPE_HEADER: group["groupType"],
+                   GROUP_NAME_HEADER: group["displayName"],
+                   ENTITY_NAME_HEADER: entity["displayName"]}
+            if include_group_type:
+                row[GROUP_TYPE_HEADER] = "Static" if group["isStatic"] else "Dynamic"
+            rows.append(row)
+        return rows
+
+    with open(output_csv, "w", newline="") as csv_out:
+        writer = csv.DictWriter(csv_out, fieldnames=headers)
+        writer.writeheader()
+        for rows in _iter_concurrent(group_rows, groups, workers=workers):
+            writer.writerows(rows)
+    return len(groups)
+
+def validate_csv(csv_file, entity_type_header=ENTITY_TYPE_HEADER,
+                 entity_name_header=ENTITY_NAME_HEADER, group_headers=[],
+                 parse_workers=1):
+    """
+        Parses a csv as main() would, without connecting to Turbonomic.
 
-    return group_changes.to_dict()
+    Args:
+        csv_file (str): Path to Target CSV, see CSVGroupParser.iter_groups
+        entity_type_header (str, optional): Header for the column that contains
+            the entity types.
+        entity_name_header (str, optional): Header for the column that contains
+            the entity names.
+        group_headers (list, optional): List of headers to group from in order.
+        parse_workers (int, optional): Number of processes parsing the csv.
+
+    Returns:
+        Dictionary of counts, members are counted once per group::
+
+            {"groups": int, "members": int,
+             "entity_types": {"entity_type": {"groups": int, "members": int}}}
+
+    Raises:
+        MissingHeaderError: If a required or group header is missing.
+    """
+    counts = {"groups": 0, "members": 0, "entity_types": {}}
+    csv_group_parser = CSVGroupParser(entity_type_header, entity_name_header)
+    for group in csv_group_parser.iter_groups(csv_file, group_headers=group_headers,
+                                              workers=parse_workers):
+        type_counts = counts["entity_types"].setdefault(group["entity_type"],
+                                                        {"groups": 0, "members": 0})
+        for c in [counts, type_counts]:
+            c["groups"] += 1
+            c["members"] += len(group["members"])
+    return counts
 
 if __name__ == "__main__":
+    __START_TIME = time.time()
+
     # Credentials
     __TURBO_TARGET = "localhost"
     __TURBO_USER = "administrator"
@@ -864,7 +3564,9 @@ if __name__ == "__main__":
 
     # Parse Arguments
     arg_parser = argparse.ArgumentParser(description="Create/Update/Delete Static Groups From A CSV File")
-    arg_parser.add_argument("input_csv", action="store", help="Path to csv file")
+    arg_parser.add_argument("input_csv", action="store",
+                            help="Path to csv file, optionally .gz, .bz2 or .xz"
+                                 " compressed, or - for stdin")
 
     arg_parser.add_argument("-u", "--username", action="store", required=False,
                             help=("Turbonomic Username, Password will be prompted."))
@@ -872,10 +3574,14 @@ if __name__ == "__main__":
     arg_parser.add_argument("--encoded_creds", action="store", required=False,
                             help=("Base64 encoded credentials"))
 
-    arg_parser.add_argument("-t", "--target", action="store", required=False,
-                            help="Turbonomic server address. Default={}".format(__TURBO_TARGET),
+    arg_parser.add_argument("-t", "--target", nargs='+', action="store", required=False,
+                            help=("Turbonomic server addresses, the csv is synced to"
+                                  " each concurrently. Default={}".format(__TURBO_TARGET)),
                             default=__TURBO_TARGET)
 
+    arg_parser.add_argument("--target_workers", action="store", type=int, required=False,
+                            help="Number of targets synced concurrently. Default=all")
+
     arg_parser.add_argument("--no_add", action="store_true", required=False,
                             help="Prevents adding entities when updating groups. (Delete Only)")
 
@@ -922,6 +3628,76 @@ if __name__ == "__main__":
     arg_parser.add_argument("--active_only", action="store_true", required=False,
                             help=("Add active VM if multiple instances of same name exists"))
 
+    arg_parser.add_argument("--lookup_method", action="store", required=False,
+                            choices=LOOKUP_METHODS, default=LOOKUP_AUTO,
+                            help=("Entity name lookup method. '{}' fetches all entities"
+                                  " of each type once, '{}' searches once per"
+                                  " name, '{}' searches many names per request,"
+                                  " '{}' picks '{}' or '{}' for each entity type."
+                                  " Default='{}'".format(LOOKUP_BULK, LOOKUP_NAME,
+                                                         LOOKUP_REGEX, LOOKUP_AUTO,
+                                                         LOOKUP_REGEX, LOOKUP_BULK,
+                                                         LOOKUP_AUTO)))
+
+    arg_parser.add_argument("--workers", action="store", type=int, required=False,
+                            default=1,
+                            help="Number of concurrent requests to the Turbonomic server. Default=1")
+
+    arg_parser.add_argument("--parse_workers", action="store", type=int, required=False,
+                            default=1,
+                            help="Number of processes parsing the csv, capped at the number of CPUs. Default=1")
+
+    arg_parser.add_argument("--async", action="store_true", required=False,
+                            dest="run_async",
+                            help="Run concurrent requests as asyncio coroutines")
+
+    arg_parser.add_argument("--anti_groups", action="store_true", required=False,
+                            help=("Give each group every entity of its type that is"
+                                  " not listed for it in the csv"))
+
+    arg_parser.add_argument("--cache", action="store", required=False,
+                            help="Path to a local cache file of entity uuids and synced group members")
+
+    arg_parser.add_argument("--cache_ttl", action="store", type=int, required=False,
+                            default=CACHE_TTL,
+                            help=("Seconds before cached uuids are fetched again."
+                                  " Default={}".format(CACHE_TTL)))
+
+    arg_parser.add_argument("--clear_cache", action="store_true", required=False,
+                            help="Remove cached uuids for the target before running")
+
+    arg_parser.add_argument("--delta", action="store_true", required=False,
+                            help=("Skip csv groups that are unchanged since the last"
+                                  " sync recorded in --cache"))
+
+    arg_parser.add_argument("--verify_all", action="store_true", required=False,
+                            help=("Fetch members of every group, even if the cache"
+                                  " shows it is unchanged since the last run"))
+
+    arg_parser.add_argument("--commit_batch_size", action="store", type=int,
+                            required=False, default=COMMIT_BATCH_SIZE,
+                            help=("Number of group changes committed before waiting"
+                                  " for the batch to finish. Default=all"))
+
+    arg_parser.add_argument("--commit_rate", action="store", type=float,
+                            required=False, default=COMMIT_RATE,
+                            help=("Maximum group changes committed per second."
+                                  " Default=unlimited"))
+
+    arg_parser.add_argument("--journal", action="store", required=False,
+                            help="Path to a journal file the run is recorded to")
+
+    arg_parser.add_argument("--resume", action="store_true", required=False,
+                            help=("Resume an unfinished run of the same csv and"
+                                  " options from --journal"))
+
+    arg_parser.add_argument("--metrics_json", action="store", required=False,
+                            help="Path to write phase timings and api call metrics as JSON")
+
+    arg_parser.add_argument("--validate_only", action="store_true", required=False,
+                            help=("Check the csv headers and count groups and members"
+                                  " without connecting to Turbonomic"))
+
     # Parse Arguments
     args_dict = vars(arg_parser.parse_args())
 
@@ -930,6 +3706,49 @@ if __name__ == "__main__":
         args_dict = _config_to_args(args_dict["config"], args_dict,
                                    ignore=["config", "input_csv"])
 
+    if args_dict["resume"] and not args_dict["journal"]:
+        arg_parser.error("--resume requires --journal")
+
+    if args_dict["delta"] and not args_dict["cache"]:
+        arg_parser.error("--delta requires --cache")
+
+    if args_dict["log"]:
+        # Create Logger
+        LOGGER = logging.getLogger(__name__)
+        LOGGER.setLevel(logging.DEBUG)
+        log_formatter = logging.Formatter(fmt='%(asctime)s %(levelname)s  %(message)s',
+                                          datefmt ='%Y-%m-%d %H:%M:%S')
+        log_handler = RotatingFileHandler(args_dict["log"], mode='a', maxBytes=10*1024*1024,
+                                          backupCount=1, encoding=None, delay=0)
+
+        log_handler.setFormatter(log_formatter)
+        LOGGER.addHandler(log_handler)
+
+    QUIET = args_dict["quiet"]
+    WARN =  args_dict["no_warn"]
+
+    # Parse the csv without credentials or a connection
+    if args_dict["validate_only"]:
+        try:
+            counts = validate_csv(args_dict["input_csv"],
+                                  group_headers=args_dict["group_headers"],
+                                  parse_workers=args_dict["parse_workers"])
+        except Exception as e:
+            _msg("Invalid csv: {}".format(e), level="error", error=True)
+            sys.exit(1)
+        lines = ["CSV is valid: {groups} groups, {members} members".format(**counts)]
+        for e_type, type_counts in sorted(counts["entity_types"].items()):
+            lines.append("  {}: {groups} groups, {members} members".format(
+                e_type, **type_counts))
+        lines.append("Validated in {:.3f}s".format(time.time() - __START_TIME))
+        _msg("\n".join(lines), level="info")
+        sys.exit(0)
+
+    # Deferred until a connection is needed
+    import vmtconnect as vconn
+    import requests
+    from requests.packages.urllib3.exceptions import InsecureRequestWarning
+
     # Overide credentials if passed as args
     if args_dict["encoded_creds"]:
         __TURBO_CREDS = args_dict["encoded_creds"].encode()
@@ -940,8 +3759,7 @@ if __name__ == "__main__":
         except KeyboardInterrupt:
             print("\n")
             sys.exit()
-    if args_dict["target"]:
-        __TURBO_TARGET = args_dict["target"]
+    targets = _parse_targets(args_dict)
 
     if args_dict["group_delimiter"]:
         GROUP_DELIMITER = args_dict["group_delimiter"]
@@ -950,38 +3768,57 @@ if __name__ == "__main__":
     if args_dict["ignore_insecure_warning"]:
         requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
-    if args_dict["log"]:
-        # Create Logger
-        LOGGER = logging.getLogger(__name__)
-        LOGGER.setLevel(logging.DEBUG)
-        log_formatter = logging.Formatter(fmt='%(asctime)s %(levelname)s  %(message)s',
-                                          datefmt ='%Y-%m-%d %H:%M:%S')
-        log_handler = RotatingFileHandler(args_dict["log"], mode='a', maxBytes=10*1024*1024,
-                                          backupCount=1, encoding=None, delay=0)
-
-        log_handler.setFormatter(log_formatter)
-        LOGGER.addHandler(log_handler)
-
-    QUIET = args_dict["quiet"]
-    WARN =  args_dict["no_warn"]
-
     try:
-        # Make connection object
-        conn = vconn.Session(__TURBO_TARGET, __TURBO_USER, __TURBO_PASS,
-                             __TURBO_CREDS)
-        __TURBO_USER = __TURBO_PASS = __TURBO_ENC = None
-        # Execute main function
-        change_summary = main(conn, args_dict["input_csv"],
-                              group_headers=args_dict["group_headers"],
-                              no_add=args_dict["no_add"],
-                              no_remove=args_dict["no_remove"],
-                              dryrun=args_dict["dryrun"],
-                              delete=args_dict["delete"],
-                              case_sensitive=not args_dict["case_insensitive"],
-                              active_only=args_dict["active_only"] )
+        sync_kwargs = {"group_headers": args_dict["group_headers"],
+                       "no_add": args_dict["no_add"],
+                       "no_remove": args_dict["no_remove"],
+                       "dryrun": args_dict["dryrun"],
+                       "delete": args_dict["delete"],
+                       "case_sensitive": not args_dict["case_insensitive"],
+                       "active_only": args_dict["active_only"],
+                       "lookup_method": args_dict["lookup_method"],
+                       "workers": args_dict["workers"],
+                       "cache": args_dict["cache"],
+                       "cache_ttl": args_dict["cache_ttl"],
+                       "clear_cache": args_dict["clear_cache"],
+                       "verify_all": args_dict["verify_all"],
+                       "run_async": args_dict["run_async"],
+                       "anti_groups": args_dict["anti_groups"],
+                       "commit_batch_size": args_dict["commit_batch_size"],
+                       "commit_rate": args_dict["commit_rate"],
+                       "journal": args_dict["journal"],
+                       "resume": args_dict["resume"],
+                       "delta": args_dict["delta"],
+                       "parse_workers": args_dict["parse_workers"]}
+        if len(targets) == 1:
+            __TURBO_TARGET, target_creds = targets[0]
+            # Make connection object
+            conn = vconn.Session(__TURBO_TARGET, __TURBO_USER, __TURBO_PASS,
+                                 target_creds.encode() if target_creds else __TURBO_CREDS)
+            __TURBO_USER = __TURBO_PASS = __TURBO_ENC = None
+            # Execute main function
+            change_summary = main(conn, args_dict["input_csv"], **sync_kwargs)
+            metrics_summary = change_summary[RUN_METRICS]
+        else:
+            # Each target logs in from its own worker
+            connections = {target: partial(vconn.Session, target, __TURBO_USER,
+                                           __TURBO_PASS,
+                                           target_creds.encode() if target_creds
+                                           else __TURBO_CREDS)
+                           for target, target_creds in targets}
+            __TURBO_USER = __TURBO_PASS = __TURBO_ENC = None
+            change_summary = sync_targets(connections, args_dict["input_csv"],
+                                          target_workers=args_dict["target_workers"],
+                                          **sync_kwargs)
+            metrics_summary = {target: attr[RUN_METRICS] for target, attr
+                               in change_summary[RUN_TARGETS].items()}
 
         # Log Summary
         _log_summary(change_summary, args_dict["dryrun"], ignore_total=[TRK_MISS_ENTITY])
+
+        if args_dict["metrics_json"]:
+            with open(args_dict["metrics_json"], "w") as metrics_out:
+                json.dump(metrics_summary, metrics_out, indent=2)
     except KeyboardInterrupt:
         print("\n")
         pass
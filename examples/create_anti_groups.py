@@ -3,7 +3,8 @@
     not specified for a group in the csv.
 '''
 import vmtconnect as vconn
-from csv_to_static_groups import CSVGroupParser, StaticGroup
+from csv_to_static_groups import (CSVGroupParser, StaticGroup, GroupUpdateUtility,
+                                  GroupRegistry, build_anti_groups)
 
 DRYRUN = True
 PATH_TO_CSV = ""
@@ -30,20 +31,16 @@ groups = csv_group_parser.parse(PATH_TO_CSV)
 # Get all entity types found in csv
 all_entity_types = list(set([g["entity_type"] for g in groups]))
 
-# Get all entities from Turbonomic
-entities = conn.search(types=all_entity_types)
+# Index all entities from Turbonomic
+entity_index = GroupUpdateUtility(conn).get_entity_index(all_entity_types)
 
-for group in groups:
-    group_instance = StaticGroup(conn, group["name"], group["entity_type"])
+# List existing groups once for every group below
+registry = GroupRegistry(conn)
 
-    # All Entity Names
-    all_entity_names = [e["displayName"] for e in entities if e["className"] == group["entity_type"]]
+# Calculate all entities that are not in csv group members.
+for group in build_anti_groups(groups, entity_index):
+    group_instance = StaticGroup(conn, group["name"], group["entity_type"],
+                                 group["members"], registry=registry)
 
-    # Calculate all vms that are not in csv group members.
-    anti_members = list(set(all_entity_names).difference(set(group["members"])))
-
-    # Set group_instance.members to anti_members
-    group_instance.members = anti_members
-
-    # Commit Changes
-    group_instance.add_or_update(lookup_names=True)
+    # Commit Changes, members are already uuids
+    group_instance.add_or_update(dryrun=DRYRUN)
@@ -2,7 +2,8 @@
     Script that deletes group from a csv.
 '''
 import vmtconnect as vconn
-from csv_to_static_groups import CSVGroupParser, StaticGroup, MissingUUIDError
+from csv_to_static_groups import (CSVGroupParser, StaticGroup, GroupRegistry,
+                                  MissingUUIDError)
 
 # Credentials
 TURBO_TARGET = "localhost"
@@ -25,9 +26,13 @@ csv_group_parser = CSVGroupParser(ENTITY_TYPE_HEADER, ENTITY_NAME_HEADER)
 # Parse PATH_TO_CSV
 groups = csv_group_parser.parse(PATH_TO_CSV)
 
+# List existing groups once for every group below
+registry = GroupRegistry(conn)
+
 for group in groups:
     # Instantiate a new StaticGroup
-    group_instance = StaticGroup(conn, group["name"], group["entity_type"])
+    group_instance = StaticGroup(conn, group["name"], group["entity_type"],
+                                 registry=registry)
     try:
         # Attempt Removal
         group_instance.remove()
@@ -41,4 +41,10 @@ changes = csv_to_static_groups.main(conn, PATH_TO_CSV, dryrun=DRYRUN)
 # Print Total Changes
 print("\n")
 for category, attr in changes.items():
+    if category == csv_to_static_groups.RUN_METRICS:
+        continue
     print("{}: {}".format(category, attr["total"]))
+
+# Print time spent in each phase
+for phase, attr in changes[csv_to_static_groups.RUN_METRICS]["phases"].items():
+    print("{}: {:.3f}s".format(phase, attr["wall_time"]))
@@ -0,0 +1,272 @@
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+import unittest
+import warnings
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "csv_to_static_groups"))
+import csv_to_static_groups
+from csv_to_static_groups import (AsyncGroupUpdateUtility, AsyncRunner,
+                                  AsyncStaticGroup)
+
+try:
+    import vmtconnect
+except ImportError:
+    vmtconnect = None
+
+# Seconds the fake server holds each request, so concurrent requests overlap
+REQUEST_DELAY = 0.05
+API_PATH = "/api/v3"
+VERSION_INFO = ("Turbonomic Operations Manager 8.5.0 (Build \"20220101000000\")"
+                " \"2022-01-01 00:00:00\"\n\naction-orchestrator: 8.5.0\n")
+
+class FakeTurbonomicHandler(BaseHTTPRequestHandler):
+    """Serves the endpoints vmtconnect and StaticGroup use from server.groups"""
+    # Keep connections alive, so clients can reuse them
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super(FakeTurbonomicHandler, self).setup()
+        # A handler serves every request of a single connection
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _respond(self, body, status=200):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(REQUEST_DELAY)
+            url = urlparse(self.path)
+            parts = url.path[len(API_PATH):].strip("/").split("/")
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            dto = None
+            if body and self.headers.get("Content-Type") == "application/json":
+                dto = json.loads(body)
+            with server.lock:
+                response = self._route(method, parts, dto)
+            if response is None:
+                self._respond({"message": "Not found"}, status=404)
+            else:
+                self._respond(response)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _route(self, method, parts, dto):
+        groups = self.server.groups
+        if parts == ["admin", "versions"]:
+            return {"versionInfo": VERSION_INFO, "version": "8.5.0",
+                    "branch": "8.5.0", "build": "20220101000000",
+                    "marketVersion": 2}
+        if parts == ["login"] and method == "POST":
+            return {"username": "administrator"}
+        if parts[0] == "markets":
+            return [{"uuid": "777777", "displayName": "Market"}]
+        if parts == ["search"] and method == "POST":
+            criteria = dto["criteriaList"][0]
+            if criteria["filterType"] != "groupsByName":
+                return None
+            return [self._group_dto(uuid) for uuid, group in groups.items()
+                    if re.match(criteria["expVal"], group["displayName"])]
+        if parts == ["groups"] and method == "POST":
+            uuid = "group-{}".format(len(groups))
+            groups[uuid] = {"displayName": dto["displayName"],
+                            "groupType": dto["groupType"],
+                            "members": list(dto["memberUuidList"])}
+            return self._group_dto(uuid)
+        if len(parts) < 2 or parts[0] != "groups" or parts[1] not in groups:
+            return None
+        uuid = parts[1]
+        if parts[2:] == ["members"] and method == "GET":
+            return [{"uuid": m, "className": groups[uuid]["groupType"]}
+                    for m in groups[uuid]["members"]]
+        if len(parts) == 2 and method == "GET":
+            return self._group_dto(uuid)
+        if len(parts) == 2 and method == "PUT":
+            groups[uuid]["members"] = list(dto["memberUuidList"])
+            return self._group_dto(uuid)
+        if len(parts) == 2 and method == "DELETE":
+            del groups[uuid]
+            return {}
+        return None
+
+    def _group_dto(self, uuid):
+        group = self.server.groups[uuid]
+        return {"uuid": uuid, "displayName": group["displayName"],
+                "groupType": group["groupType"], "isStatic": True,
+                "membersCount": len(group["members"])}
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+@unittest.skipIf(vmtconnect is None, "vmtconnect is not installed")
+class TestAsyncInterfaces(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTurbonomicHandler)
+        self.server.daemon_threads = True
+        self.server.lock = threading.Lock()
+        self.server.connections = 0
+        self.server.requests = 0
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.groups = {}
+        for i in range(16):
+            self.server.groups["uuid-{}".format(i)] = {
+                "displayName": "group-{}".format(i),
+                "groupType": "VirtualMachine",
+                "members": ["vm-{}".format(i), "vm-{}".format(i + 1)]}
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        with warnings.catch_warnings():
+            # The fake server only speaks plain HTTP
+            warnings.simplefilter("ignore")
+            self.conn = vmtconnect.Connection(
+                host="127.0.0.1:{}".format(self.server.server_address[1]),
+                username="administrator", password="password", ssl=False)
+        self.addCleanup(self.conn._Connection__session.close)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def run_async(self, coroutine):
+        # asyncio must not fall back to deprecated implicit event loops
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            return asyncio.run(coroutine)
+
+    def get_members(self, runner, count=8):
+        async def get_members():
+            groups = [AsyncStaticGroup(self.conn, "group-{}".format(i),
+                                       "VirtualMachine",
+                                       uuid="uuid-{}".format(i), runner=runner)
+                      for i in range(count)]
+            return await asyncio.gather(*[g.get_current_members() for g in groups])
+
+        return self.run_async(get_members())
+
+    def test_shared_runner_caps_concurrent_requests(self):
+        with AsyncRunner(concurrency=3) as runner:
+            members = self.get_members(runner)
+        self.assertEqual([sorted(m["uuid"] for m in group) for group in members],
+                         [["vm-{}".format(i), "vm-{}".format(i + 1)]
+                          for i in range(8)])
+        self.assertGreater(self.server.max_in_flight, 1)
+        self.assertLessEqual(self.server.max_in_flight, 3)
+
+    def test_requests_reuse_session_connections(self):
+        connections = self.server.connections
+        with AsyncRunner(concurrency=3) as runner:
+            for _ in range(3):
+                self.get_members(runner)
+        # 24 requests over at most one new connection per concurrent call
+        self.assertLessEqual(self.server.connections - connections, 3)
+
+    def test_pool_sized_for_runner_concurrency(self):
+        concurrency = csv_to_static_groups.HTTP_POOL_SIZE + 6
+        with AsyncRunner(concurrency=concurrency) as runner:
+            self.get_members(runner, count=concurrency)
+            connections = self.server.connections
+            self.get_members(runner, count=concurrency)
+        self.assertGreater(self.server.max_in_flight,
+                           csv_to_static_groups.HTTP_POOL_SIZE)
+        # Every connection of the first round was kept alive for the second
+        self.assertEqual(self.server.connections, connections)
+        adapter = self.conn._Connection__session.get_adapter("http://")
+        self.assertEqual(adapter._pool_maxsize, concurrency)
+        # vmtconnect's retries of failed connections are kept
+        self.assertEqual(adapter.max_retries.total, 3)
+
+    def test_add_and_update(self):
+        async def sync_group():
+            async with AsyncStaticGroup(self.conn, "web", "VirtualMachine",
+                                        members=["vm-1", "vm-2"]) as group:
+                self.assertFalse(await group.exists())
+                await group.add()
+                self.assertTrue(await group.exists())
+                group.members = ["vm-2", "vm-3"]
+                plan = await group.plan()
+                await group.update(plan=plan)
+                return plan, group.uuid, group.runner
+
+        plan, uuid, runner = self.run_async(sync_group())
+        self.assertEqual(plan["add"], ["vm-3"])
+        self.assertEqual(plan["remove"], ["vm-1"])
+        self.assertEqual(sorted(self.server.groups[uuid]["members"]),
+                         ["vm-2", "vm-3"])
+        self.assertTrue(runner._executor._shutdown)
+
+    def test_group_update_utility(self):
+        async def get_diff():
+            async with AsyncGroupUpdateUtility(self.conn) as utils:
+                diff = await utils.get_group_diff("uuid-0", ["vm-1", "vm-9"])
+                index = await utils.get_group_index(names=["group-1", "group-10"])
+                return diff, index, utils.runner
+
+        diff, index, runner = self.run_async(get_diff())
+        self.assertEqual(diff, {"add": ["vm-9"], "remove": ["vm-0"]})
+        self.assertEqual(index, {"group-1": [{"uuid": "uuid-1"}],
+                                 "group-10": [{"uuid": "uuid-10"}]})
+        self.assertTrue(runner._executor._shutdown)
+
+    def test_close_only_owned_runner(self):
+        owned = AsyncStaticGroup(self.conn, "group-0", "VirtualMachine",
+                                 uuid="uuid-0")
+        owned.close()
+        with self.assertRaises(RuntimeError):
+            owned.runner._executor.submit(len, [])
+
+        with AsyncRunner() as runner:
+            with AsyncStaticGroup(self.conn, "group-0", "VirtualMachine",
+                                  uuid="uuid-0", runner=runner):
+                pass
+            with AsyncGroupUpdateUtility(self.conn, runner=runner):
+                pass
+            # The shared runner is still usable
+            self.assertEqual(runner._executor.submit(len, [1]).result(), 1)
+        with self.assertRaises(RuntimeError):
+            runner._executor.submit(len, [])
+
+    def test_map_concurrent_run_async(self):
+        uuids = ["uuid-{}".format(i) for i in range(8)]
+        with warnings.catch_warnings():
+            warnings.simplefilter("error", DeprecationWarning)
+            members = csv_to_static_groups._map_concurrent(self.conn.get_group_members,
+                                                           uuids, workers=4,
+                                                           run_async=True)
+        self.assertEqual(members, [self.conn.get_group_members(u) for u in uuids])
+        self.assertLessEqual(self.server.max_in_flight, 4)
+
+if __name__ == "__main__":
+    unittest.main()
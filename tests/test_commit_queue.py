@@ -0,0 +1,114 @@
+import json
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "csv_to_static_groups"))
+import csv_to_static_groups
+from csv_to_static_groups import CommitConflictError, CommitQueue
+
+ENTITIES = [{"uuid": "vm-{}".format(i), "displayName": "web-{}".format(i),
+             "className": "VirtualMachine"} for i in range(1, 5)] + \
+           [{"uuid": "pm-1", "displayName": "host-1", "className": "PhysicalMachine"}]
+
+class FakeConnection(object):
+    """Serves entities and groups, and records group changes"""
+    def __init__(self, groups={}):
+        self.groups = {uuid: dict(g) for uuid, g in groups.items()}
+        self.changes = []
+
+    def search(self, types=None, dto=None, **kwargs):
+        if dto is None:
+            return [dict(e) for e in ENTITIES if e["className"] in types]
+        pattern = json.loads(dto)["criteriaList"][0]["expVal"]
+        return [{"uuid": uuid, "displayName": g["displayName"],
+                 "membersCount": len(g["members"])}
+                for uuid, g in self.groups.items()
+                if re.match(pattern, g["displayName"])]
+
+    def get_group_members(self, uuid, **kwargs):
+        return [{"uuid": m} for m in self.groups[uuid]["members"]]
+
+    def add_static_group(self, name, type, members=None):
+        self.changes.append(("add", name, type, sorted(members)))
+        return [{"uuid": "group-{}".format(name)}]
+
+    def update_static_group_members(self, uuid, members, name=None, type=None):
+        self.changes.append(("update", uuid, sorted(members)))
+        return [{"uuid": uuid}]
+
+    def del_group(self, uuid):
+        self.changes.append(("delete", uuid))
+        return True
+
+def group(name, members, entity_type="VirtualMachine"):
+    return {"name": name, "entity_type": entity_type, "members": members}
+
+class TestCommitQueue(unittest.TestCase):
+    def queued(self, action, **kwargs):
+        return dict({"name": "web", "entity_type": "VirtualMachine",
+                     "uuid": "group-1", "members": ["vm-1"]}, **kwargs)
+
+    def test_deletes_are_coalesced(self):
+        queue = CommitQueue(FakeConnection())
+        queue.put(csv_to_static_groups.COMMIT_DELETE,
+                  self.queued(csv_to_static_groups.COMMIT_DELETE))
+        queue.put(csv_to_static_groups.COMMIT_DELETE,
+                  self.queued(csv_to_static_groups.COMMIT_DELETE,
+                              entity_type="PhysicalMachine"))
+        self.assertEqual(len(queue), 1)
+
+    def test_second_add_or_update_conflicts(self):
+        for action in [csv_to_static_groups.COMMIT_ADD,
+                       csv_to_static_groups.COMMIT_UPDATE]:
+            queue = CommitQueue(FakeConnection())
+            queue.put(action, self.queued(action), plan={})
+            with self.assertRaises(CommitConflictError):
+                queue.put(action, self.queued(action, members=["vm-2"]), plan={})
+            self.assertEqual(len(queue), 1)
+
+class TestMainCoalescing(unittest.TestCase):
+    def sync(self, conn, groups, **kwargs):
+        return csv_to_static_groups.main(conn, "groups.csv", groups=groups,
+                                         lookup_method=csv_to_static_groups.LOOKUP_BULK,
+                                         **kwargs)
+
+    def test_same_type_groups_are_added_once(self):
+        conn = FakeConnection()
+        changes = self.sync(conn, [group("web", ["web-1", "web-2"]),
+                                   group("web", ["web-2", "web-3"]),
+                                   group("web", ["host-1"], "PhysicalMachine"),
+                                   group("db", ["web-4"])])
+        self.assertEqual(conn.changes,
+                         [("add", "web", "VirtualMachine", ["vm-1", "vm-2", "vm-3"]),
+                          ("add", "db", "VirtualMachine", ["vm-4"])])
+        errors = changes[csv_to_static_groups.TRK_ERROR]["events"]
+        self.assertEqual(len(errors), 1)
+        self.assertIn("already listed as VirtualMachine", errors[0]["message"])
+
+    def test_same_type_groups_are_updated_once(self):
+        # The first group needs no change alone, the second removes vm-1
+        conn = FakeConnection({"group-1": {"displayName": "web",
+                                           "members": ["vm-1", "vm-2"]}})
+        self.sync(conn, [group("web", ["web-1", "web-2"]),
+                         group("web", ["web-2", "web-3"])])
+        self.assertEqual(conn.changes, [("update", "group-1", ["vm-1", "vm-2", "vm-3"])])
+
+    def test_caller_groups_are_not_merged(self):
+        groups = [group("web", ["web-1"]), group("web", ["web-2"])]
+        self.sync(FakeConnection(), groups, dryrun=True)
+        self.assertEqual(groups[0]["members"], ["web-1"])
+
+    def test_delete_coalesces_types(self):
+        conn = FakeConnection({"group-1": {"displayName": "web",
+                                           "members": ["vm-1"]}})
+        changes = self.sync(conn, [group("web", ["web-1"]),
+                                   group("web", ["host-1"], "PhysicalMachine")],
+                            delete=True)
+        self.assertEqual(conn.changes, [("delete", "group-1")])
+        self.assertEqual(changes[csv_to_static_groups.TRK_DELETE]["total"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
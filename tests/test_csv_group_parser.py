@@ -0,0 +1,221 @@
+import csv
+import gzip
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "csv_to_static_groups"))
+import csv_to_static_groups
+from csv_to_static_groups import CSVGroupParser, MissingHeaderError
+
+# Tutorial csvs from docs/source/supported_csv_format.rst
+SIMPLE_CSV = [["Entity Type", "Entity Name", "Department"],
+              ["VirtualMachine", "eng-vm-1", "Engineering"],
+              ["VirtualMachine", "eng-vm-2", "Engineering"],
+              ["VirtualMachine", "eng-vm-3", "Engineering"],
+              ["VirtualMachine", "eng-vm-4", "Engineering"],
+              ["VirtualMachine", "sales-vm-1", "Sales"],
+              ["VirtualMachine", "sales-vm-2", "Sales"],
+              ["VirtualMachine", "sales-vm-3", "Sales"]]
+
+MULTI_LEVEL_CSV = [["Entity Type", "Entity Name", "Department", "Owner"],
+                   ["VirtualMachine", "eng-vm-1", "Engineering", "John"],
+                   ["VirtualMachine", "eng-vm-2", "Engineering", "John"],
+                   ["VirtualMachine", "eng-vm-3", "Engineering", "John"],
+                   ["VirtualMachine", "eng-vm-4", "Engineering", "Greg"],
+                   ["VirtualMachine", "sales-vm-1", "Sales", "Bill"],
+                   ["VirtualMachine", "sales-vm-2", "Sales", "Steve"],
+                   ["VirtualMachine", "sales-vm-3", "Sales", "Steve"]]
+
+EMPTY_CELLS_CSV = [["Entity Type", "Entity Name", "Department", "Owner"],
+                   ["VirtualMachine", "eng-vm-1", "Engineering", "John"],
+                   ["VirtualMachine", "eng-vm-2", "Engineering", "John"],
+                   ["VirtualMachine", "eng-vm-3", "Engineering", ""],
+                   ["VirtualMachine", "eng-vm-4", "Engineering", ""],
+                   ["VirtualMachine", "sales-vm-1", "Sales", "Bill"],
+                   ["VirtualMachine", "sales-vm-2", "Sales", "Steve"],
+                   ["VirtualMachine", "sales-vm-3", "Sales", "Steve"],
+                   ["VirtualMachine", "eng-vm-1", "Engineering", ""],
+                   ["VirtualMachine", "eng-vm-2", "Engineering", ""],
+                   ["VirtualMachine", "orphan-vm", "", ""]]
+
+PREFIX_SUFFIX_CSV = [["Prefix", "Entity Type", "Entity Name", "Department", "Suffix"],
+                     ["temp", "VirtualMachine", "eng-vm-1", "Engineering", "VMs"],
+                     ["temp", "VirtualMachine", "eng-vm-2", "Engineering", "VMs"],
+                     ["temp", "VirtualMachine", "eng-vm-3", "Engineering", "VMs"],
+                     ["temp", "VirtualMachine", "eng-vm-4", "Engineering", "VMs"],
+                     ["temp", "VirtualMachine", "sales-vm-1", "Sales", "VMs"],
+                     ["temp", "VirtualMachine", "sales-vm-2", "Sales", "VMs"],
+                     ["temp", "VirtualMachine", "sales-vm-3", "Sales", "VMs"]]
+
+MIXED_TYPES_CSV = [["Entity Type", "Entity Name", "Department", "Owner"],
+                   ["VirtualMachine", "eng-vm-1", "Engineering", "John"],
+                   ["PhysicalMachine", "eng-pm-1", "Engineering", "John"],
+                   ["Storage", "eng-ds-1", "Engineering", "John"],
+                   ["VirtualMachine", "eng-vm-1", "Engineering", "John"],
+                   ["PhysicalMachine", "sales-pm-1", "Sales", "Steve"],
+                   ["VirtualMachine", "sales-vm-1", "Sales", "Steve"],
+                   ["VirtualMachine", "Sales", "Sales", "Sales"]]
+
+def legacy_parse(csv_file, entity_type_header, entity_name_header,
+                 group_headers=[], group_prefix="", group_delimiter="_"):
+    """CSVGroupParser.parse as it was before the single pass grouping"""
+    with open(csv_file, mode='r', encoding='utf-8-sig') as csvfile:
+        contents = [row for row in csv.DictReader(csvfile)]
+    for h in [entity_name_header, entity_type_header]+group_headers:
+        if h not in contents[0].keys():
+            raise MissingHeaderError("Header '{}' could not be found".format(h))
+
+    if len(group_headers) == 0:
+        group_headers = [h for h in contents[0].keys() if h not in [entity_name_header, entity_type_header]]
+    groups = {}
+    for row in contents:
+        cur_groupings = []
+        if group_prefix:
+            cur_groupings.append(group_prefix)
+        for i, group_key in enumerate(group_headers):
+            if row[group_key] not in ["", None]:
+                cur_groupings.append(row[group_key])
+            if i == len(group_headers)-1:
+                group_name = group_delimiter.join(cur_groupings)
+                groups.setdefault(group_name, []).append(
+                    {v: row[v] for v in [entity_name_header, entity_type_header]})
+            elif row[group_key] not in cur_groupings:
+                cur_groupings.append(row[group_key])
+
+    final_groups = []
+    for group, members in groups.items():
+        if group == "":
+            continue
+        for e_type in set([m[entity_type_header] for m in members]):
+            final_groups.append({"name": group,
+                                 "entity_type": e_type,
+                                 "members": list(set(m[entity_name_header] for m in members
+                                                     if m[entity_type_header] == e_type))})
+    return final_groups
+
+class TestCSVGroupParser(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def write_csv(self, rows, name="groups.csv", encoding="utf-8-sig", **kwargs):
+        path = os.path.join(self.tmp_dir, name)
+        with open(path, "w", encoding=encoding, newline="") as csv_out:
+            csv.writer(csv_out, **kwargs).writerows(rows)
+        return path
+
+    @staticmethod
+    def normalize(groups):
+        return sorted((g["name"], g["entity_type"], sorted(g["members"]))
+                      for g in groups)
+
+    @staticmethod
+    def group_order(groups):
+        names = []
+        for g in groups:
+            if g["name"] not in names:
+                names.append(g["name"])
+        return names
+
+    def assert_matches_legacy(self, rows, group_headers=[], **kwargs):
+        csv_file = self.write_csv(rows)
+        parser = CSVGroupParser(csv_to_static_groups.ENTITY_TYPE_HEADER,
+                                csv_to_static_groups.ENTITY_NAME_HEADER, **kwargs)
+        groups = parser.parse(csv_file, group_headers=group_headers)
+        expected = legacy_parse(csv_file, csv_to_static_groups.ENTITY_TYPE_HEADER,
+                                csv_to_static_groups.ENTITY_NAME_HEADER,
+                                group_headers=group_headers, **kwargs)
+        self.assertEqual(self.normalize(groups), self.normalize(expected))
+        self.assertEqual(self.group_order(groups), self.group_order(expected))
+        return groups
+
+    def test_simple_grouping(self):
+        groups = self.assert_matches_legacy(SIMPLE_CSV)
+        self.assertEqual([(g["name"], len(g["members"])) for g in groups],
+                         [("Engineering", 4), ("Sales", 3)])
+
+    def test_multi_level_grouping(self):
+        groups = self.assert_matches_legacy(MULTI_LEVEL_CSV)
+        self.assertEqual([(g["name"], len(g["members"])) for g in groups],
+                         [("Engineering_John", 3), ("Engineering_Greg", 1),
+                          ("Sales_Bill", 1), ("Sales_Steve", 2)])
+
+    def test_group_headers(self):
+        groups = self.assert_matches_legacy(MULTI_LEVEL_CSV,
+                                            group_headers=["Department"])
+        self.assertEqual([(g["name"], len(g["members"])) for g in groups],
+                         [("Engineering", 4), ("Sales", 3)])
+        self.assert_matches_legacy(MULTI_LEVEL_CSV,
+                                   group_headers=["Owner", "Department"])
+
+    def test_empty_cells(self):
+        groups = self.assert_matches_legacy(EMPTY_CELLS_CSV)
+        self.assertEqual(sorted((g["name"], len(g["members"])) for g in groups),
+                         [("Engineering", 4), ("Engineering_John", 2),
+                          ("Sales_Bill", 1), ("Sales_Steve", 2)])
+
+    def test_prefix_and_suffix(self):
+        groups = self.assert_matches_legacy(PREFIX_SUFFIX_CSV)
+        self.assertEqual([(g["name"], len(g["members"])) for g in groups],
+                         [("temp_Engineering_VMs", 4), ("temp_Sales_VMs", 3)])
+
+    def test_mixed_entity_types(self):
+        self.assert_matches_legacy(MIXED_TYPES_CSV)
+        self.assert_matches_legacy(MIXED_TYPES_CSV, group_prefix="csv",
+                                   group_delimiter="-")
+
+    def test_missing_header(self):
+        csv_file = self.write_csv(SIMPLE_CSV)
+        parser = CSVGroupParser(csv_to_static_groups.ENTITY_TYPE_HEADER,
+                                csv_to_static_groups.ENTITY_NAME_HEADER)
+        with self.assertRaises(MissingHeaderError):
+            parser.parse(csv_file, group_headers=["Owner"])
+
+    def test_parallel_line_terminators(self):
+        rows = MULTI_LEVEL_CSV + [["VirtualMachine", "multi\nline-vm", "Sales", "Bill"]]
+        parser = CSVGroupParser(csv_to_static_groups.ENTITY_TYPE_HEADER,
+                                csv_to_static_groups.ENTITY_NAME_HEADER)
+        # Run the parallel parser regardless of the CPUs on this host
+        with mock.patch.object(csv_to_static_groups.os, "cpu_count", return_value=4):
+            for lineterminator in ["\r\n", "\n", "\r"]:
+                csv_file = self.write_csv(rows, lineterminator=lineterminator,
+                                          quoting=csv.QUOTE_ALL)
+                groups = parser.parse(csv_file, workers=4)
+                self.assertEqual(self.normalize(groups),
+                                 self.normalize(parser.parse(csv_file)))
+                self.assertEqual(len(groups), 4)
+
+    def test_bare_carriage_returns_parse_serially(self):
+        csv_file = self.write_csv(SIMPLE_CSV, lineterminator="\r")
+        parser = CSVGroupParser(csv_to_static_groups.ENTITY_TYPE_HEADER,
+                                csv_to_static_groups.ENTITY_NAME_HEADER)
+        self.assertIsNone(parser._parallel_groups(csv_file, [], 4))
+
+    def test_compressed_csv(self):
+        csv_file = self.write_csv(SIMPLE_CSV)
+        with open(csv_file, "rb") as csv_in, \
+                gzip.open(csv_file + ".gz", "wb") as csv_out:
+            csv_out.write(csv_in.read())
+        parser = CSVGroupParser(csv_to_static_groups.ENTITY_TYPE_HEADER,
+                                csv_to_static_groups.ENTITY_NAME_HEADER)
+        self.assertEqual(self.normalize(parser.parse(csv_file + ".gz")),
+                         self.normalize(parser.parse(csv_file)))
+
+    def test_feature_modules_are_not_imported(self):
+        modules = ["sqlite3", "gzip", "mmap", "hashlib", "concurrent.futures"]
+        script = ("import sys; sys.path.insert(0, {!r}); import csv_to_static_groups;"
+                  " print(' '.join(m for m in {!r} if m in sys.modules))").format(
+                      os.path.dirname(csv_to_static_groups.__file__), modules)
+        output = subprocess.check_output([sys.executable, "-c", script])
+        self.assertEqual(output.decode().split(), [])
+
+if __name__ == "__main__":
+    unittest.main()
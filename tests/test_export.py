@@ -0,0 +1,65 @@
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "csv_to_static_groups"))
+import csv_to_static_groups
+
+GROUP_COUNT = 12
+
+class FakeConnection(object):
+    """Serves custom groups, the first groups answering slowest"""
+    def __init__(self):
+        self.groups = [{"uuid": "uuid-{}".format(i),
+                        "displayName": "group-{}".format(i),
+                        "groupType": "VirtualMachine", "isStatic": True}
+                       for i in range(GROUP_COUNT)]
+
+    def request(self, path, method="GET", **kwargs):
+        return [dict(g) for g in self.groups]
+
+    def get_group_members(self, uuid, **kwargs):
+        i = int(uuid.split("-")[1])
+        time.sleep(0.005 * (GROUP_COUNT - i))
+        return [{"uuid": "vm-{}-{}".format(i, m),
+                 "displayName": "vm-{}-{}".format(i, m)} for m in range(3)]
+
+class TestExportGroups(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def export(self, workers):
+        output_csv = os.path.join(self.tmp_dir, "export-{}.csv".format(workers))
+        count = csv_to_static_groups.export_groups(FakeConnection(), output_csv,
+                                                   workers=workers)
+        self.assertEqual(count, GROUP_COUNT)
+        with open(output_csv) as csv_in:
+            return csv_in.read()
+
+    def test_concurrent_export_keeps_group_order(self):
+        serial = self.export(1)
+        self.assertEqual(serial.splitlines()[1], "VirtualMachine,vm-0-0,group-0")
+        for workers in [2, 4, 16]:
+            self.assertEqual(self.export(workers), serial)
+
+    def test_iter_concurrent_bounds_pending_calls(self):
+        started = []
+
+        def call(i):
+            started.append(i)
+            return i
+
+        results = csv_to_static_groups._iter_concurrent(call, range(100), workers=4)
+        self.assertEqual(next(results), 0)
+        self.assertLessEqual(len(started), 8)
+        self.assertEqual(list(results), list(range(1, 100)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+import json
+import os
+import sys
+import types
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "csv_to_static_groups"))
+import csv_to_static_groups
+from csv_to_static_groups import (DuplicateMatchingGroupError,
+                                  EntityNameResolver, GroupRegistry,
+                                  GroupUpdateUtility, NoMatchingGroupError,
+                                  ResolutionMemo, StaticGroup)
+
+# Name filter types of search criteria, as vmtconnect and Turbonomic use them
+FILTER_TYPES = {"Group": "groupsByName", "VirtualMachine": "vmsByName",
+                "PhysicalMachine": "pmsByName", "Storage": "storageByName"}
+
+ENTITIES = [{"uuid": "vm-1", "displayName": "web-1", "className": "VirtualMachine"},
+            {"uuid": "vm-2", "displayName": "web-2", "className": "VirtualMachine"},
+            {"uuid": "pm-1", "displayName": "host-1", "className": "PhysicalMachine"},
+            {"uuid": "ds-1", "displayName": "store-1", "className": "Storage"}]
+
+# "web" is a prefix of "web-prod", which is listed first
+GROUPS = [{"uuid": "group-2", "displayName": "web-prod", "membersCount": 1},
+          {"uuid": "group-1", "displayName": "web", "membersCount": 2}]
+
+def fake_vmtconnect(prefixes):
+    module = types.ModuleType("vmtconnect")
+    module._class_filter_prefix = prefixes
+    return module
+
+class FakeConnection(object):
+    """Records searches and rejects unknown search filter types"""
+    def __init__(self):
+        self.searches = []
+        self.name_searches = []
+
+    def search(self, types=None, dto=None, **kwargs):
+        if dto is None:
+            return [dict(e) for e in ENTITIES if not types or e["className"] in types]
+        dto = json.loads(dto)
+        criteria = dto["criteriaList"][0]
+        self.searches.append((dto["className"], criteria["filterType"]))
+        if criteria["filterType"] != FILTER_TYPES.get(dto["className"]):
+            raise ValueError("Invalid filterType {}".format(criteria["filterType"]))
+        if dto["className"] == "Group":
+            return [dict(g) for g in GROUPS]
+        return [dict(e) for e in ENTITIES if e["className"] == dto["className"]]
+
+    def search_by_name(self, name, type=None, case_sensitive=False, **kwargs):
+        self.name_searches.append((type, name))
+        return [dict(e) for e in ENTITIES
+                if e["className"] == type and e["displayName"] == name]
+
+    def get_group_by_name(self, name, **kwargs):
+        # vmtconnect returns the first group whose name contains name
+        return [dict(g) for g in GROUPS if name in g["displayName"]][:1] or None
+
+    def get_supplychains(self, uuids, types=None, **kwargs):
+        return [{"seMap": {"VirtualMachine": {"entitiesCount": 1000},
+                           "Storage": {"entitiesCount": 1000}}}]
+
+class TestNameLookup(unittest.TestCase):
+    def setUp(self):
+        self.conn = FakeConnection()
+        modules = mock.patch.dict(sys.modules, {"vmtconnect": fake_vmtconnect(
+            {"VirtualMachine": "vms", "PhysicalMachine": "pms"})})
+        modules.start()
+        self.addCleanup(modules.stop)
+
+    def test_search_names_uses_vmtconnect_filter_type(self):
+        for e_type, uuid in [("VirtualMachine", "vm-1"), ("PhysicalMachine", "pm-1")]:
+            entities = csv_to_static_groups._search_names(self.conn, e_type,
+                                                          "^(web-1|host-1)$",
+                                                          ["web-1", "host-1"])
+            self.assertIn(uuid, [e["uuid"] for e in entities])
+        self.assertEqual(self.conn.searches, [("VirtualMachine", "vmsByName"),
+                                              ("PhysicalMachine", "pmsByName")])
+        self.assertEqual(self.conn.name_searches, [])
+
+    def test_search_names_falls_back_to_search_by_name(self):
+        entities = csv_to_static_groups._search_names(self.conn, "Storage",
+                                                      "^(store-1|store-2)$",
+                                                      ["store-1", "store-2"])
+        self.assertEqual([e["uuid"] for e in entities], ["ds-1"])
+        self.assertEqual(self.conn.searches, [])
+        self.assertEqual(self.conn.name_searches, [("Storage", "store-1"),
+                                                   ("Storage", "store-2")])
+
+    def test_search_names_without_vmtconnect(self):
+        with mock.patch.dict(sys.modules, {"vmtconnect": None}):
+            entities = csv_to_static_groups._search_names(self.conn, "VirtualMachine",
+                                                          "^(web-1)$", ["web-1"])
+        self.assertEqual([e["uuid"] for e in entities], ["vm-1"])
+        self.assertEqual(self.conn.searches, [])
+
+    def test_static_group_resolve_names(self):
+        group = StaticGroup(self.conn, "web", "VirtualMachine", ["web-1", "web-3"])
+        resolved = group.resolve_names(["web-1", "web-3"])
+        self.assertEqual(resolved["matched"], {"web-1": "vm-1"})
+        self.assertEqual(resolved["missing"], ["web-3"])
+        self.assertEqual(self.conn.searches, [("VirtualMachine", "vmsByName")])
+
+    def test_regex_resolver(self):
+        resolver = EntityNameResolver(self.conn, method=csv_to_static_groups.LOOKUP_REGEX)
+        resolver.prefetch_names({"VirtualMachine": ["web-2"], "Storage": ["store-1"]})
+        self.assertEqual(resolver.resolve("VirtualMachine", "web-2"), "vm-2")
+        self.assertEqual(resolver.resolve("Storage", "store-1"), "ds-1")
+        self.assertEqual(self.conn.searches, [("VirtualMachine", "vmsByName")])
+        self.assertEqual(self.conn.name_searches, [("Storage", "store-1")])
+
+    def test_auto_resolver_needs_filter_type_for_regex(self):
+        resolver = EntityNameResolver(self.conn, method=csv_to_static_groups.LOOKUP_AUTO)
+        resolver.prefetch_names({"VirtualMachine": ["web-2"], "Storage": ["store-1"]})
+        self.assertEqual(resolver.type_method("VirtualMachine"),
+                         csv_to_static_groups.LOOKUP_REGEX)
+        self.assertEqual(resolver.type_method("Storage"),
+                         csv_to_static_groups.LOOKUP_BULK)
+        self.assertEqual(resolver.resolve("Storage", "store-1"), "ds-1")
+
+    def test_memo_casefolds_names(self):
+        memo = ResolutionMemo()
+        memo.set("VirtualMachine", "Straße", ["vm-1"], case_sensitive=False)
+        self.assertEqual(memo.get("VirtualMachine", "STRASSE", case_sensitive=False),
+                         ["vm-1"])
+        self.assertIsNone(memo.get("VirtualMachine", "STRASSE"))
+        self.assertEqual((memo.hits, memo.misses), (1, 1))
+
+    def test_group_index_filter_type(self):
+        index = GroupUpdateUtility(self.conn).get_group_index(names=["web"])
+        self.assertEqual(index, {"web": [{"uuid": "group-1"}]})
+        self.assertEqual(self.conn.searches, [("Group", "groupsByName")])
+
+    def test_registry_refresh_exact_name(self):
+        registry = GroupRegistry(self.conn, group_index={})
+        groups = registry.refresh("web")
+        self.assertEqual([g["uuid"] for g in groups], ["group-1"])
+        self.assertEqual(registry.get("web"), ["group-1"])
+        self.assertEqual(registry.refresh("web-"), [])
+        self.assertNotIn("web-", registry)
+
+    def test_static_group_uuid_exact_name(self):
+        self.assertEqual(StaticGroup(self.conn, "web", "VirtualMachine")._get_group_uuid(),
+                         "group-1")
+        with self.assertRaises(NoMatchingGroupError):
+            StaticGroup(self.conn, "we", "VirtualMachine")._get_group_uuid()
+        duplicate = dict(GROUPS[1], uuid="group-3")
+        self.conn.search = lambda dto=None, **kwargs: GROUPS + [duplicate]
+        with self.assertRaises(DuplicateMatchingGroupError):
+            StaticGroup(self.conn, "web", "VirtualMachine")._get_group_uuid()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "csv_to_static_groups"))
+import csv_to_static_groups
+from csv_to_static_groups import SyncCache
+
+try:
+    import vmtconnect
+except ImportError:
+    vmtconnect = None
+
+class FakeConnection(object):
+    """Serves groups from a dictionary, like vmtconnect's Connection"""
+    def __init__(self, groups):
+        self.groups = groups
+        self.calls = []
+
+    def _group(self, uuid):
+        if uuid not in self.groups:
+            raise vmtconnect.HTTP404Error("HTTP 404 - Resource Not Found")
+        return self.groups[uuid]
+
+    def search(self, dto=None, **kwargs):
+        self.calls.append("search")
+        pattern = json.loads(dto)["criteriaList"][0]["expVal"]
+        return [{"uuid": uuid, "displayName": g["displayName"],
+                 "membersCount": len(g["members"])}
+                for uuid, g in self.groups.items()
+                if re.match(pattern, g["displayName"])]
+
+    def get_group_by_name(self, name, **kwargs):
+        # vmtconnect returns the first group whose name contains name
+        self.calls.append("get_group_by_name")
+        for uuid, g in self.groups.items():
+            if name in g["displayName"]:
+                return [{"uuid": uuid, "displayName": g["displayName"]}]
+        return None
+
+    def get_group_members(self, uuid, **kwargs):
+        self.calls.append("get_group_members")
+        return [{"uuid": m} for m in self._group(uuid)["members"]]
+
+@unittest.skipIf(vmtconnect is None, "vmtconnect is not installed")
+class TestStaleGroups(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache = SyncCache(os.path.join(self.tmp_dir, "cache.db"), "target")
+        # "web" is a prefix of "web-prod", which is listed first
+        self.conn = FakeConnection({
+            "group-2": {"displayName": "web-prod", "members": ["vm-8", "vm-9"]},
+            "group-1": {"displayName": "web", "members": ["vm-1", "vm-2"]}})
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.tmp_dir)
+
+    def manage_group(self, name):
+        group = {"name": name, "entity_type": "VirtualMachine",
+                 "members": ["vm-1", "vm-3"], "uuid": "group-deleted",
+                 "members_count": 2}
+        return group, csv_to_static_groups._manage_group(self.conn, group,
+                                                         cache=self.cache)
+
+    def test_stale_uuid_resolves_exact_name(self):
+        group, (action, plan, events) = self.manage_group("web")
+        self.assertEqual(events, [])
+        self.assertEqual(group["uuid"], "group-1")
+        self.assertEqual(action, csv_to_static_groups.COMMIT_UPDATE)
+        self.assertEqual((plan["add"], plan["remove"]), (["vm-3"], ["vm-2"]))
+        self.assertNotIn("get_group_by_name", self.conn.calls)
+
+    def test_stale_uuid_without_group(self):
+        del self.conn.groups["group-1"]
+        group, (action, plan, events) = self.manage_group("web")
+        self.assertEqual((action, plan), (None, None))
+        self.assertEqual(events[0][0], csv_to_static_groups.TRK_ERROR)
+        self.assertIn("No group found", events[0][1][1])
+
+    def test_stale_uuid_with_duplicate_groups(self):
+        self.conn.groups["group-3"] = {"displayName": "web", "members": []}
+        group, (action, plan, events) = self.manage_group("web")
+        self.assertEqual((action, plan), (None, None))
+        self.assertIn("multiple groups", events[0][1][1])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "..", "csv_to_static_groups"))
+import csv_to_static_groups
+
+try:
+    import vmtconnect
+except ImportError:
+    vmtconnect = None
+
+def throttled():
+    return vmtconnect.HTTP503Error("HTTP 503 - Service Unavailable: No retry provided.")
+
+class FakeConnection(object):
+    """Fails the first calls of each method with the queued errors"""
+    def __init__(self, errors={}, groups=[]):
+        self.errors = {method: list(e) for method, e in errors.items()}
+        self.groups = list(groups)
+        self.calls = []
+
+    def _call(self, method):
+        self.calls.append(method)
+        if self.errors.get(method):
+            raise self.errors[method].pop(0)
+
+    def get_group_members(self, uuid, **kwargs):
+        self._call("get_group_members")
+        return [{"uuid": "vm-1"}]
+
+    def search(self, dto=None, **kwargs):
+        self._call("search")
+        pattern = json.loads(dto)["criteriaList"][0]["expVal"]
+        return [g for g in self.groups if g["displayName"] in pattern]
+
+    def update_static_group_members(self, uuid, members, name=None, type=None):
+        self._call("update_static_group_members")
+        return [{"uuid": uuid}]
+
+    def add_static_group(self, name, type, members=None):
+        self._call("add_static_group")
+        group = {"uuid": "group-{}".format(len(self.groups)), "displayName": name}
+        self.groups.append(group)
+        return [group]
+
+@unittest.skipIf(vmtconnect is None, "vmtconnect is not installed")
+class TestThrottledConnection(unittest.TestCase):
+    def setUp(self):
+        backoff = mock.patch.object(csv_to_static_groups, "RETRY_BACKOFF", 0)
+        backoff.start()
+        self.addCleanup(backoff.stop)
+
+    def test_reads_are_retried(self):
+        errors = [throttled(),
+                  vmtconnect.HTTP400Error("HTTP 429 - Client Error : [{}]")]
+        conn = FakeConnection(errors={"get_group_members": errors})
+        throttled_conn = csv_to_static_groups._ThrottledConnection(conn)
+        self.assertEqual(throttled_conn.get_group_members("group-1"),
+                         [{"uuid": "vm-1"}])
+        self.assertEqual(conn.calls, ["get_group_members"] * 3)
+
+    def test_only_throttled_errors_are_retried(self):
+        for error in [vmtconnect.HTTP404Error("HTTP 404 - Resource Not Found"
+                                              " : [{'message': 'HTTP 503'}]"),
+                      vmtconnect.HTTP400Error("HTTP 400 - Client Error"
+                                              " : [{'message': 'HTTP 429'}]"),
+                      Exception("HTTP 503 - Service Unavailable")]:
+            conn = FakeConnection(errors={"get_group_members": [error]})
+            with self.assertRaises(type(error)):
+                csv_to_static_groups._ThrottledConnection(conn).get_group_members("group-1")
+            self.assertEqual(conn.calls, ["get_group_members"])
+
+    def test_updates_are_not_retried(self):
+        conn = FakeConnection(errors={"update_static_group_members": [throttled()]})
+        with self.assertRaises(vmtconnect.HTTP503Error):
+            csv_to_static_groups._ThrottledConnection(conn).update_static_group_members(
+                "group-1", ["vm-1"])
+        self.assertEqual(conn.calls, ["update_static_group_members"])
+
+    def test_add_is_retried_if_not_created(self):
+        conn = FakeConnection(errors={"add_static_group": [throttled()]},
+                              groups=[{"uuid": "group-0", "displayName": "web-prod"}])
+        response = csv_to_static_groups._ThrottledConnection(conn).add_static_group(
+            "web", "VirtualMachine", ["vm-1"])
+        self.assertEqual(response, [{"uuid": "group-1", "displayName": "web"}])
+        self.assertEqual(conn.calls, ["add_static_group", "search", "add_static_group"])
+
+    def test_add_is_not_repeated_if_created(self):
+        class CreatedConnection(FakeConnection):
+            def add_static_group(self, name, type, members=None):
+                # The server creates the group, then fails the response
+                self.groups.append({"uuid": "group-web", "displayName": name})
+                return super(CreatedConnection, self).add_static_group(name, type,
+                                                                       members)
+
+        conn = CreatedConnection(errors={"add_static_group": [throttled()]})
+        response = csv_to_static_groups._ThrottledConnection(conn).add_static_group(
+            "web", "VirtualMachine", ["vm-1"])
+        self.assertEqual(response, [{"uuid": "group-web", "displayName": "web"}])
+        self.assertEqual(conn.calls, ["add_static_group", "search"])
+        self.assertEqual(len(conn.groups), 1)
+
+if __name__ == "__main__":
+    unittest.main()